@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from sensor.people_counter import DirectionStateSnapshot, START_TIME, END_TIME, TRIGGER_DISTANCES, END_DISTANCE
+from sensor.tof_sensor import Directions
+from storage.event_codec import encode_event_binary, encode_event_json
+import json
+import timeit
+
+
+ITERATIONS = 20000
+SAMPLES = 30    # Trigger distances per direction of a typical crossing
+
+
+def create_direction_state() -> DirectionStateSnapshot:
+    now = datetime.now()
+    return DirectionStateSnapshot({
+        Directions.INSIDE: [{
+            START_TIME: now,
+            END_TIME: now + timedelta(seconds=1),
+            TRIGGER_DISTANCES: [80.5 + i for i in range(SAMPLES)],
+            END_DISTANCE: 210.3
+        }],
+        Directions.OUTSIDE: [{
+            START_TIME: now - timedelta(seconds=0.5),
+            END_TIME: now + timedelta(seconds=0.5),
+            TRIGGER_DISTANCES: [90.1 + i for i in range(SAMPLES)],
+            END_DISTANCE: 205.0
+        }]
+    })
+
+
+def encode_legacy(directionState: DirectionStateSnapshot) -> str:
+    return json.dumps({
+        'version': 'v0.0',
+        'previousPeopleCount': 1,
+        'countChange': 1,
+        'directionState': directionState.toDict(),
+        'dateTime': datetime.now(),
+        'motionTriggeredLights': False
+    }, default=str)
+
+
+if __name__ == "__main__":
+    directionState = create_direction_state()
+    encoders = {
+        "json.dumps": lambda: encode_legacy(directionState),
+        "compact json": lambda: encode_event_json(1, 1, directionState, datetime.now(), False),
+        "binary": lambda: encode_event_binary(1, 1, directionState, datetime.now(), False)
+    }
+
+    for name, encode in encoders.items():
+        seconds = timeit.timeit(encode, number=ITERATIONS)
+        print(f"{name}: {seconds / ITERATIONS * 1e6:.1f} us per event, {len(encode())} bytes")
@@ -1,8 +1,22 @@
+from monitoring.profiler import SamplingProfiler
 from sensor.people_counter import PeopleCounter
+from sensor.data_ready import GpioDataReadySource
 from sensor.vl53l1x_sensor import VL53L1XSensor
+from sensor.watchdog_sensor import WatchdogSensor
+from sensor.shared_ring_counter import SharedRingCounter
 import logging
 
-counter = PeopleCounter(VL53L1XSensor())
+USE_SENSOR_DAEMON = False   # Read events of a running sensor_daemon.py instead of opening the sensor
+SENSOR_LANES = 1    # Lanes side by side in the doorway, counted separately, e.g. 2 for a double-width door
+DATA_READY_PIN = None  # BCM pin wired to GPIO1 of the sensor, to read measurements as soon as they are ready. None to poll
+
+
+def create_sensor() -> VL53L1XSensor:
+    dataReady = None if DATA_READY_PIN is None else GpioDataReadySource(DATA_READY_PIN)
+    return VL53L1XSensor(dataReady, lanes=SENSOR_LANES)
+
+
+counter = SharedRingCounter() if USE_SENSOR_DAEMON else PeopleCounter(WatchdogSensor(create_sensor(), sensorFactory=create_sensor))
 peopleCount = 0
 
 logging.getLogger().setLevel(logging.INFO)
@@ -15,4 +29,5 @@ def countChange(change: int) -> None:
 
 
 counter.hookCounting(countChange)
+SamplingProfiler().installSignalHandler()  # Profile on SIGUSR1
 counter.run()
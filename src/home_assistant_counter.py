@@ -1,5 +1,9 @@
+from monitoring.profiler import SamplingProfiler
 from sensor.people_counter import PeopleCounter
+from sensor.data_ready import GpioDataReadySource
 from sensor.vl53l1x_sensor import VL53L1XSensor
+from sensor.watchdog_sensor import WatchdogSensor
+from sensor.shared_ring_counter import SharedRingCounter
 import paho.mqtt.client as mqtt
 from HaMqtt.MQTTSensor import MQTTSensor
 from HaMqtt.MQTTUtil import HaDeviceClass
@@ -12,6 +16,9 @@ HA_SENSOR_NAME = ""
 HA_SENSOR_ID = ""
 HA_SENSOR_DEVICE_CLASS = HaDeviceClass.NONE
 SENSOR_UNIT = ""
+USE_SENSOR_DAEMON = False   # Read events of a running sensor_daemon.py instead of opening the sensor
+SENSOR_LANES = 1    # Lanes side by side in the doorway, counted separately, e.g. 2 for a double-width door
+DATA_READY_PIN = None  # BCM pin wired to GPIO1 of the sensor, to read measurements as soon as they are ready. None to poll
 
 
 # Setup connection to HA
@@ -38,7 +45,13 @@ def countChange(change: int) -> None:
     logging.debug(f'People count changed by {change}')
 
 
+def create_sensor() -> VL53L1XSensor:
+    dataReady = None if DATA_READY_PIN is None else GpioDataReadySource(DATA_READY_PIN)
+    return VL53L1XSensor(dataReady, lanes=SENSOR_LANES)
+
+
 # Setup people count sensor
-counter = PeopleCounter(VL53L1XSensor())
+counter = SharedRingCounter() if USE_SENSOR_DAEMON else PeopleCounter(WatchdogSensor(create_sensor(), sensorFactory=create_sensor))
 counter.hookCounting(countChange)
+SamplingProfiler().installSignalHandler()  # Profile on SIGUSR1
 counter.run()
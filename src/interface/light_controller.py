@@ -0,0 +1,225 @@
+from datetime import datetime, time
+from typing import Callable, Dict, List, Tuple
+from sensor.tof_sensor import Directions
+import logging
+import queue
+import threading
+
+
+# Event types
+COUNT_EVENT = "count"
+TRIGGER_EVENT = "trigger"
+SCHEDULE_EVENT = "schedule"
+CHANGE_EVENT = "change"
+STOP_EVENT = "stop"
+
+
+class LightController ():
+    """Owns the people count and the light state in a single thread.
+
+    Count, trigger, schedule and change events are queued from any thread and handled in order.
+    Events that queued up while the bridge was busy are handled as one batch:
+    the light state is read once, all events are applied to the in-memory state,
+    and only the resulting light state is sent to the bridge.
+    """
+
+    def __init__(self, hue, lightGroup: str, getSceneForTime: Callable[[time], str],
+                 onChange: Callable[[int, int, object, bool], None] = None,
+                 onCorrection: Callable[[int], None] = None) -> None:
+        """
+        Args:
+            hue (PhilipsHue): Light interface, or anything with the same group methods.
+            lightGroup (str): Group of the lights to control.
+            getSceneForTime (Callable[[time], str]): Returns the scene to use at a given time, or None.
+            onChange (Callable, optional): Called in the controller thread for every change event with the
+                people count before the change, the count change, the direction state and the motion triggered light state.
+            onCorrection (Callable[[int], None], optional): Called with the people count, before it is corrected based on the light state.
+        """
+        self.hue = hue
+        self.lightGroup = lightGroup
+        self.getSceneForTime = getSceneForTime
+        self.onChange = onChange
+        self.onCorrection = onCorrection
+
+        self.queue: queue.Queue = queue.Queue()
+        self.peopleCount: int = 0   # Count of people on the inside
+        self.motionTriggeredLights = False  # Is light on because of any detected motion
+
+    def postCount(self, change: int) -> None:
+        self.queue.put((COUNT_EVENT, change))
+
+    def postTrigger(self, triggerState: Dict) -> None:
+        self.queue.put((TRIGGER_EVENT, triggerState))
+
+    def postSchedule(self) -> None:
+        self.queue.put((SCHEDULE_EVENT, None))
+
+    def postChange(self, countChange: int, directionState) -> None:
+        self.queue.put((CHANGE_EVENT, (countChange, directionState)))
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.queue.put((STOP_EVENT, None))
+        self.thread.join()
+
+    def run(self) -> None:
+        while True:
+            # Block for the first event, then take everything else that queued up meanwhile
+            events = [self.queue.get()]
+            try:
+                while True:
+                    events.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                self.handleEvents([e for e in events if e[0] != STOP_EVENT])
+            except Exception as ex:
+                logging.exception(f'Unable to handle light events. {ex}')
+
+            if any(e[0] == STOP_EVENT for e in events):
+                return
+
+    def handleEvents(self, events: List[Tuple[str, object]]) -> None:
+        if len(events) <= 0:
+            return
+
+        # Only ask the bridge if an event depends on the light state
+        lightsOn = None
+        if any(e[0] in [COUNT_EVENT, TRIGGER_EVENT, SCHEDULE_EVENT] for e in events):
+            try:
+                lightsOn = self.getLightState()
+            except Exception as ex:
+                # Still handle the whole batch, counts are only applied without correction
+                logging.warning(f'Unable to read light state. {ex}')
+        previousLightsOn = lightsOn
+        updateScene = False
+
+        for event, data in events:
+            if event == COUNT_EVENT:
+                lightsOn = self.applyCount(data, lightsOn)
+            elif event == TRIGGER_EVENT:
+                lightsOn = self.applyTrigger(data, lightsOn)
+            elif event == SCHEDULE_EVENT:
+                updateScene = True
+            elif event == CHANGE_EVENT and self.onChange is not None:
+                self.onChange(self.peopleCount, data[0], data[1], self.motionTriggeredLights)
+
+        if lightsOn != previousLightsOn:
+            self.setLightState(lightsOn)
+        elif updateScene and lightsOn and self.peopleCount > 0:
+            # Lights stay on, only the scene has to be updated
+            self.setLightScene(self.getSceneForTime(datetime.now().time()))
+
+    def applyCount(self, change: int, lightsOn: bool) -> bool:
+        """Applies a people count change.
+
+        Args:
+            change (int): The change in the number of people. Usually on of [-1, 0, 1].
+            lightsOn (bool): Current light state. None if unknown, which skips the correction.
+
+        Returns:
+            bool: Target light state.
+        """
+        # Apply correction
+        if lightsOn is None:
+            pass
+        elif self.peopleCount <= 0 and lightsOn and not self.motionTriggeredLights:
+            # Count was 0, but lights were on (not because of motion triggers) => people count was not actually 0
+            self.notifyCorrection()
+            self.peopleCount = 1
+            logging.debug(f'People count corrected to {self.peopleCount}')
+        elif self.peopleCount > 0 and not lightsOn:
+            # Count was >0, but lights were off => people count was actually 0
+            self.notifyCorrection()
+            self.peopleCount = 0
+            logging.debug(f'People count corrected to {self.peopleCount}')
+
+        self.peopleCount += change
+        if self.peopleCount < 0:
+            self.peopleCount = 0
+        logging.debug(f'People count changed by {change}')
+
+        # Handle light
+        targetLightState = self.peopleCount > 0
+
+        if lightsOn == targetLightState and lightsOn:
+            # Signaling that the people count is taking control over the light now
+            self.motionTriggeredLights = False
+
+        return targetLightState
+
+    def applyTrigger(self, triggerState: Dict, lightsOn: bool) -> bool:
+        """Applies motion triggered light state.
+
+        Args:
+            triggerState (Dict): Describing in what directions the sensor is triggerd.
+            lightsOn (bool): Current light state.
+
+        Returns:
+            bool: Target light state.
+        """
+        # Is someone walking close to the door?
+        motionDetected = triggerState[Directions.INSIDE] or triggerState[Directions.OUTSIDE]
+
+        # Does motion triggered light need to do anything?
+        if self.peopleCount > 0:
+            # State is successfully handled by the count
+            self.motionTriggeredLights = False
+            return lightsOn
+
+        # Only look at changing situations
+        if motionDetected == self.motionTriggeredLights:
+            return lightsOn
+
+        # Save state
+        self.motionTriggeredLights = motionDetected
+        return motionDetected
+
+    def notifyCorrection(self) -> None:
+        if self.onCorrection is not None:
+            self.onCorrection(self.peopleCount)
+
+    def setLightScene(self, targetScene: str) -> None:
+        """Sets the lights to the given scene.
+
+        Args:
+            targetScene (str): Name of the scene to activate.
+        """
+        # Is valid scene?
+        if targetScene is None:
+            return
+
+        self.hue.set_group_scene(self.lightGroup, targetScene)
+        logging.debug(f'Light scene set to {targetScene}')
+
+    def setLightState(self, targetLightState: bool) -> None:
+        """Sets the lights to the given state.
+
+        Args:
+            targetLightState (bool): Should lights on the inside be on or off.
+        """
+        targetScene = self.getSceneForTime(datetime.now().time())
+        if targetLightState and targetScene:
+            # Set to specific scene if exists
+            self.hue.set_group_scene(self.lightGroup, targetScene)
+            logging.debug(f'Light state changed to {targetLightState} with scene {targetScene}')
+        else:
+            self.hue.set_group(self.lightGroup, {'on': targetLightState})
+            logging.debug(f'Light state changed to {targetLightState}')
+
+    def getLightState(self) -> bool:
+        """
+        Raises:
+            ConnectionError: If the bridge did not answer, e.g. after a failed reconnect.
+
+        Returns:
+            bool: Current light state.
+        """
+        group = self.hue.get_group(self.lightGroup)
+        if group is None:
+            raise ConnectionError("No response from bridge")
+        return group['state']['any_on']
@@ -0,0 +1,187 @@
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, NamedTuple
+from sensor.people_counter import DirectionStateSnapshot
+from sensor.tof_sensor import Directions
+from storage.event_codec import encode_event_binary
+from time import time
+import json
+import logging
+import os
+import struct
+import threading
+
+
+DEFAULT_RING_NAME = "tof_people_count"
+
+# Record kinds
+READING = 0
+TRIGGER = 1
+CHANGE = 2
+
+# Header: index of the next record to be written, capacity in slots, slot size in bytes, process id of the writer
+HEADER = struct.Struct("<QIII")
+# Slot: record index, timestamp, kind, count change, lane and direction, trigger bits, distance, payload length
+SLOT = struct.Struct("<QdBbBBfH")
+WRITING = 0xFFFFFFFFFFFFFFFF    # Record index of a slot that is currently being written
+
+# Format of the direction state payload of change records
+JSON_PAYLOAD = b"J"     # Full direction state as JSON
+BINARY_PAYLOAD = b"B"   # Fixed schema of storage.event_codec, with summarised trigger distances
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to someone else
+        return True
+    return True
+
+DIRECTION_IDS = {Directions.INSIDE: 0, Directions.OUTSIDE: 1}
+ID_DIRECTIONS = {v: k for k, v in DIRECTION_IDS.items()}
+
+
+class RingRecord (NamedTuple):
+    index: int
+    timestamp: float
+    kind: int
+    countChange: int
+    direction: Directions
+    lane: int
+    triggerState: Dict
+    distance: float
+    payload: bytes
+
+
+class SharedRingWriter ():
+    """Publishes sensor readings and counter events into a shared memory ring buffer.
+    There must only be one writer per ring. Threads of the writing process are serialized,
+    readers in other processes never take a lock.
+    """
+
+    def __init__(self, name: str = DEFAULT_RING_NAME, capacity: int = 4096, slotSize: int = 512) -> None:
+        """
+        Raises:
+            FileExistsError: If another running writer owns the ring.
+        """
+        size = HEADER.size + capacity * slotSize
+        try:
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            existing = shared_memory.SharedMemory(name)
+            ownerPid = HEADER.unpack_from(existing.buf, 0)[3] if existing.size >= HEADER.size else 0
+            if ownerPid > 0 and is_process_alive(ownerPid):
+                existing.close()
+                raise FileExistsError(f'Shared memory {name} is in use by the writer with process id {ownerPid}. Is another sensor daemon running?')
+
+            # Left over by a previous writer that did not shut down cleanly
+            existing.close()
+            existing.unlink()
+            logging.info(f'Reclaimed shared memory {name} of the stopped writer with process id {ownerPid}')
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+
+        self.capacity = capacity
+        self.slotSize = slotSize
+        self.head = 0
+        self.lock = threading.Lock()
+        HEADER.pack_into(self.memory.buf, 0, self.head, capacity, slotSize, os.getpid())
+
+    def publishReading(self, direction: Directions, distance: float) -> None:
+        self.write(READING, direction=direction, distance=distance)
+
+    def publishTrigger(self, triggerState: Dict) -> None:
+        self.write(TRIGGER, triggerState=triggerState)
+
+    def publishChange(self, countChange: int, directionState: DirectionStateSnapshot) -> None:
+        self.write(CHANGE, countChange=countChange, lane=directionState.lane, payload=self.encodeDirectionState(directionState))
+
+    def encodeDirectionState(self, directionState: DirectionStateSnapshot) -> bytes:
+        maxLength = self.slotSize - SLOT.size
+        payload = JSON_PAYLOAD + json.dumps(directionState.toDict(), default=str).encode()
+        if len(payload) <= maxLength:
+            return payload
+
+        # Long crossings or people pausing in the doorframe only fit in the fixed schema
+        payload = BINARY_PAYLOAD + encode_event_binary(0, 0, directionState, datetime.now(), False)
+        if len(payload) <= maxLength:
+            return payload
+
+        # Keep what the count change is based on, the first and last record of each direction
+        logging.warning(f'Direction state of {len(payload)} bytes does not fit into a ring slot of {self.slotSize} bytes, '
+                        'publishing only the first and last record of each direction')
+        trimmed = DirectionStateSnapshot({direction: [record.toDict() for record in records[:1] + records[1:][-1:]]
+                                          for direction, records in directionState.items()}, directionState.lane)
+        return BINARY_PAYLOAD + encode_event_binary(0, 0, trimmed, datetime.now(), False)
+
+    def write(self, kind: int, countChange: int = 0, direction: Directions = Directions.INSIDE, lane: int = 0,
+              triggerState: Dict = None, distance: float = 0, payload: bytes = b"") -> None:
+        triggerBits = 0
+        if triggerState is not None:
+            triggerBits = int(triggerState[Directions.INSIDE]) | int(triggerState[Directions.OUTSIDE]) << 1
+
+        with self.lock:
+            buf = self.memory.buf
+            offset = HEADER.size + (self.head % self.capacity) * self.slotSize
+
+            # Mark slot as in progress, so readers can detect torn records
+            struct.pack_into("<Q", buf, offset, WRITING)
+            buf[offset + SLOT.size:offset + SLOT.size + len(payload)] = payload
+            SLOT.pack_into(buf, offset, WRITING, time(), kind, countChange,
+                           lane << 1 | DIRECTION_IDS[direction], triggerBits, distance, len(payload))
+            struct.pack_into("<Q", buf, offset, self.head)
+
+            self.head += 1
+            struct.pack_into("<Q", buf, 0, self.head)
+
+    def close(self) -> None:
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedRingReader ():
+    """Reads records from a ring buffer created by a SharedRingWriter at its own pace.
+    Records that were overwritten before they could be read are counted as missed.
+    """
+
+    def __init__(self, name: str = DEFAULT_RING_NAME) -> None:
+        self.memory = shared_memory.SharedMemory(name)
+        head, self.capacity, self.slotSize, ownerPid = HEADER.unpack_from(self.memory.buf, 0)
+        if os.name == "posix" and ownerPid != os.getpid():
+            # Attaching registers the memory for removal at exit, but only the writer owns it.
+            # The tracker knows it by its POSIX name with a leading slash.
+            resource_tracker.unregister("/" + self.memory.name, "shared_memory")
+        self.position = head    # Only read records published after attaching
+        self.missed = 0
+
+    def read(self) -> List[RingRecord]:
+        buf = self.memory.buf
+        head = struct.unpack_from("<Q", buf, 0)[0]
+
+        if head - self.position > self.capacity:
+            # Reader fell behind further than the ring can hold
+            self.missed += head - self.capacity - self.position
+            self.position = head - self.capacity
+
+        records = []
+        while self.position < head:
+            offset = HEADER.size + (self.position % self.capacity) * self.slotSize
+            index, timestamp, kind, countChange, directionId, triggerBits, distance, length = SLOT.unpack_from(buf, offset)
+            payload = bytes(buf[offset + SLOT.size:offset + SLOT.size + length])
+
+            # Slot must still hold the same record after copying it
+            if index != self.position or struct.unpack_from("<Q", buf, offset)[0] != self.position:
+                self.missed += 1
+            else:
+                records.append(RingRecord(index, timestamp, kind, countChange, ID_DIRECTIONS[directionId & 1], directionId >> 1, {
+                    Directions.INSIDE: bool(triggerBits & 1),
+                    Directions.OUTSIDE: bool(triggerBits & 2)
+                }, distance, payload))
+            self.position += 1
+
+        return records
+
+    def close(self) -> None:
+        self.memory.close()
@@ -0,0 +1,136 @@
+from interface.light_controller import LightController
+from sensor.people_counter import DirectionStateSnapshot, PeopleCounter
+from sensor.trace_sensor import Crossing, TraceSensor
+from time import sleep, time
+from typing import Dict, List, Tuple
+import random
+import threading
+
+
+# Wires the counter and light controller like smart_hue_counter.py, but with a trace sensor and a local fake bridge.
+# Measures the time from the sample that asked for a light state, by completing a crossing or by starting or ending motion,
+# to the bridge receiving the resulting light command. Split into the wait for the controller, the light state read and the command itself.
+
+CROSSINGS = 15  # Crossings per run, alternating between entering and leaving
+TRAFFIC = {     # Name and range of seconds between two crossings
+    "sparse": (2, 5),
+    "busy": (0.3, 1)
+}
+BRIDGE_LATENCIES = [0, 0.05, 0.2]   # One-way latency of the fake bridge in seconds
+MOTION_TRIGGERS = [True, False]  # Runs with and without motion switching lights before the crossing completes, like ENABLE_MOTION_TRIGGERED_LIGHT
+SEED = 42
+
+
+class FakeHueBridge ():
+    """Stands in for the PhilipsHue interface, with a fixed one-way latency per request.
+    """
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.on = False
+        self.reads: List[Tuple[float, float]] = []  # Start and end of each light state read
+        self.commands: List[Tuple[float, float, bool]] = []  # Time the command was sent, received by the bridge and the requested state
+
+    def get_group(self, id, command=None):
+        # Request and response, a full round trip before the controller can decide on the light state
+        start = time()
+        sleep(self.latency * 2)
+        self.reads.append((start, time()))
+        return {'state': {'any_on': self.on}}
+
+    def set_group(self, groups, command):
+        sent = time()
+        sleep(self.latency)
+        self.commands.append((sent, time(), command['on']))
+        self.on = command['on']
+        sleep(self.latency)
+
+    def set_group_scene(self, group_name, scene_name):
+        self.set_group(group_name, {'on': True})
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def run(gaps: Tuple[float, float], latency: float, motionTriggers: bool) -> None:
+    rng = random.Random(SEED)
+    crossings = []
+    start = 0
+    for i in range(CROSSINGS):
+        start += rng.uniform(*gaps)
+        crossings.append(Crossing(start, 1, 1 if i % 2 == 0 else -1))
+        start += 1
+
+    sensor = TraceSensor(crossings)
+    counter = PeopleCounter(sensor)
+    counter.idleTimeout = None  # Only measure the path from sensor edge to light
+    bridge = FakeHueBridge(latency)
+    controller = LightController(bridge, "", lambda time: None)
+
+    requests: List[Tuple[float, bool]] = []   # Time of the sample that asked for a light state and that state
+    completions = 0
+    count = 0
+    motion = False
+
+    def recordCompletion(countChange: int, directionState: DirectionStateSnapshot):
+        nonlocal count, completions
+        if countChange == 0:
+            return
+        count = max(0, count + countChange)
+        completions += 1
+        # The completing sample is the last recorded edge of the crossing
+        completed = max(records[-1].end_time for records in directionState.values()).timestamp()
+        requests.append((completed, count > 0))
+
+    def recordMotion(triggerState: Dict):
+        nonlocal motion
+        # Motion only switches the lights while nobody is counted
+        if any(triggerState.values()) != motion and count <= 0:
+            motion = not motion
+            requests.append((time(), motion))
+
+    counter.hookChange(recordCompletion)
+    counter.hookChange(controller.postChange)
+    counter.hookCounting(controller.postCount)
+    if motionTriggers:
+        counter.hookTrigger(recordMotion)
+        counter.hookTrigger(controller.postTrigger)
+
+    controller.start()
+    th = threading.Thread(target=counter.run)
+    th.start()
+    sleep(sensor.getDuration() + 1 + latency * 4)
+    counter.stop()
+    th.join()
+    controller.stop()
+
+    # Attribute each command to the latest request before it, that asked for the same light state
+    total, waits, reads, sends = [], [], [], []
+    for sent, received, on in bridge.commands:
+        candidates = [requested for requested, state in requests if requested <= received and state == on]
+        if len(candidates) <= 0:
+            continue
+        requested = candidates[-1]
+        # Light state read of the same batch, right before the command
+        read = [(start, end) for start, end in bridge.reads if requested <= start and end <= sent]
+        readStart, readEnd = read[-1] if len(read) > 0 else (sent, sent)
+        total.append((received - requested) * 1000)
+        waits.append((readStart - requested) * 1000)
+        reads.append((readEnd - readStart) * 1000)
+        sends.append((received - sent) * 1000)
+
+    print(f"Bridge latency {latency * 1000:.0f} ms, crossings every {gaps[0]}-{gaps[1]} s, motion triggers {'on' if motionTriggers else 'off'}:")
+    print(f"  Completed crossings: {completions}, light commands: {len(bridge.commands)}, light state reads: {len(bridge.reads)}")
+    if len(total) > 0:
+        print(f"  p50 {percentile(total, 50):.1f} ms, p95 {percentile(total, 95):.1f} ms, p99 {percentile(total, 99):.1f} ms")
+        print(f"  p50 per step: controller {percentile(waits, 50):.1f} ms, get_group round trip {percentile(reads, 50):.1f} ms, "
+              f"set_group until received {percentile(sends, 50):.1f} ms")
+
+
+if __name__ == "__main__":
+    for motionTriggers in MOTION_TRIGGERS:
+        for gaps in TRAFFIC.values():
+            for latency in BRIDGE_LATENCIES:
+                run(gaps, latency, motionTriggers)
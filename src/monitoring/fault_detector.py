@@ -0,0 +1,125 @@
+from collections import deque
+from typing import Dict
+from sensor.people_counter import DirectionStateSnapshot
+from sensor.tof_sensor import Directions
+from time import monotonic
+import logging
+import threading
+
+
+class FaultDetector ():
+    """Detects counting faults while the counter is running, instead of afterwards from the log.
+
+    A fault is found if the estimated count after a completed crossing does not match the count at the next one,
+    like in statistics.py. Faults where the count was 0 are false-0, all others false-1.
+    Corrections of the count based on the light state are tracked and alerted on separately.
+    """
+
+    def __init__(self, window: float = 900, alertRate: float = 0.25, minPairs: int = 10) -> None:
+        """
+        Args:
+            window (float, optional): Seconds of the rolling window for fault rates. Defaults to 900.
+            alertRate (float, optional): Fault rate in the window, above which a warning is logged. Defaults to 0.25.
+            minPairs (int, optional): Minimum compared crossings in the window before alerting. Defaults to 10.
+        """
+        self.window = window
+        self.alertRate = alertRate
+        self.minPairs = minPairs
+        self.lock = threading.Lock()
+
+        self.previous = None    # (previousPeopleCount, countChange) of the last completed crossing
+        self.events = deque()   # (time, faultyCount or None) per compared pair in the window
+        self.corrections = deque()  # (time, corrected count) in the window
+        self.totals = {'pairs': 0, 'false_0': 0, 'false_1': 0, 'corrections': 0, 'corrected_0': 0, 'corrected_1': 0}
+        self.alerting = False
+
+    def observeChange(self, previousPeopleCount: int, countChange: int, directionState: DirectionStateSnapshot) -> None:
+        """To be called for every change, with the people count before the change is applied.
+        """
+        if not self.isCompleteCrossing(directionState):
+            return
+
+        with self.lock:
+            if self.previous is not None:
+                estimatedCount = self.previous[0] + self.previous[1]
+                faulty = estimatedCount != previousPeopleCount
+                self.addFault(self.previous[0] if faulty else None)
+            self.previous = (previousPeopleCount, countChange)
+            self.checkRates()
+
+    def observeCorrection(self, previousPeopleCount: int) -> None:
+        """To be called if the people count had to be corrected, e.g. because of an unexpected light state.
+        """
+        with self.lock:
+            self.corrections.append((monotonic(), previousPeopleCount))
+            self.totals['corrections'] += 1
+            # Corrected from 0 hints at a false-0, from more at a false-1. Kept apart from the pairwise faults,
+            # since the corrected count also shows up as a mismatch of the next pair
+            self.totals['corrected_0' if previousPeopleCount == 0 else 'corrected_1'] += 1
+            self.checkRates()
+
+    def isCompleteCrossing(self, directionState: DirectionStateSnapshot) -> bool:
+        if directionState is None:
+            return False
+
+        for direction in Directions:
+            records = directionState[direction]
+            if len(records) <= 0 or records[-1].end_time is None:
+                return False
+        return True
+
+    def addFault(self, faultyCount: int) -> None:
+        self.events.append((monotonic(), faultyCount))
+        self.totals['pairs'] += 1
+        if faultyCount == 0:
+            self.totals['false_0'] += 1
+        elif faultyCount is not None:
+            self.totals['false_1'] += 1
+
+    def expire(self) -> None:
+        limit = monotonic() - self.window
+        for events in [self.events, self.corrections]:
+            while len(events) > 0 and events[0][0] < limit:
+                events.popleft()
+
+    def getWindowMetrics(self) -> Dict:
+        self.expire()
+        pairs = len(self.events)
+        false0 = sum(1 for _, count in self.events if count == 0)
+        false1 = sum(1 for _, count in self.events if count is not None and count != 0)
+        corrected0 = sum(1 for _, count in self.corrections if count == 0)
+        return {
+            'pairs': pairs,
+            'false_0': false0,
+            'false_1': false1,
+            'fault_rate': (false0 + false1) / pairs if pairs > 0 else 0,
+            'corrections': len(self.corrections),
+            'corrected_0': corrected0,
+            'corrected_1': len(self.corrections) - corrected0,
+            'correction_rate': len(self.corrections) / pairs if pairs > 0 else 0
+        }
+
+    def checkRates(self) -> None:
+        metrics = self.getWindowMetrics()
+        enoughPairs = metrics['pairs'] >= self.minPairs
+        faultAlert = enoughPairs and metrics['fault_rate'] > self.alertRate
+        correctionAlert = enoughPairs and metrics['correction_rate'] > self.alertRate
+        if not self.alerting:
+            if faultAlert:
+                logging.warning(f'Fault rate of {metrics["fault_rate"] * 100:.0f} % in the last {self.window:.0f} seconds. Sensor might be drifting.')
+            if correctionAlert:
+                logging.warning(f'{metrics["corrections"]} light state corrections per {metrics["pairs"]} crossings in the last {self.window:.0f} seconds. Sensor might be drifting.')
+        self.alerting = faultAlert or correctionAlert
+
+    def getMetrics(self) -> Dict:
+        """
+        Returns:
+            Dict: Fault counts since start and within the rolling window.
+        """
+        with self.lock:
+            return {
+                'total': dict(self.totals),
+                'window': self.getWindowMetrics(),
+                'window_seconds': self.window,
+                'alerting': self.alerting
+            }
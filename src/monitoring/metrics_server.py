@@ -0,0 +1,72 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+from urllib.parse import parse_qs, urlparse
+import json
+import logging
+import threading
+
+
+class MetricsServer ():
+    """Serves live metrics as JSON over HTTP in a background thread.
+    GET /metrics returns the result of all registered metric functions.
+    """
+
+    def __init__(self, port: int = 8000, host: str = "127.0.0.1") -> None:
+        """
+        Args:
+            port (int, optional): Port to listen on. Defaults to 8000.
+            host (str, optional): Address to listen on. Defaults to "127.0.0.1", only local clients. "" for all interfaces.
+        """
+        self.port = port
+        self.host = host
+        self.metrics: Dict[str, Callable[[], Dict]] = {}
+        self.routes: Dict[str, Callable[[Dict], Dict]] = {"/metrics": lambda query: self.collect()}
+
+    def addMetrics(self, name: str, metrics: Callable[[], Dict]) -> None:
+        self.metrics[name] = metrics
+
+    def addRoute(self, path: str, handler: Callable[[Dict], Dict]) -> None:
+        """Adds a GET route, that is called with the parsed query parameters and responds with the returned object as JSON.
+        """
+        self.routes[path] = handler
+
+    def collect(self) -> Dict:
+        return {name: metrics() for name, metrics in self.metrics.items()}
+
+    def start(self) -> None:
+        server = self
+
+        class Handler (BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                handler = server.routes.get(url.path)
+                if handler is None:
+                    self.send_error(404)
+                    return
+
+                try:
+                    body = json.dumps(handler(parse_qs(url.query)), default=str).encode()
+                except ValueError as ex:
+                    # Invalid query parameters
+                    self.send_error(400, str(ex))
+                    return
+                except Exception as ex:
+                    logging.exception(f'Unable to handle {url.path}. {ex}')
+                    self.send_error(500)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(format % args)
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info(f'Serving metrics on {self.host or "all interfaces"}, port {self.port}')
+
+    def stop(self) -> None:
+        self.server.shutdown()
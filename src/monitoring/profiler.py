@@ -0,0 +1,106 @@
+from collections import Counter
+from datetime import datetime
+from typing import Dict
+from time import monotonic, sleep
+import logging
+import math
+import os
+import re
+import signal
+import sys
+import threading
+
+
+class SamplingProfiler ():
+    """Samples the stacks of all threads of the running process for a while and writes them in the collapsed stack format,
+    which can be turned into a flamegraph, e.g. with flamegraph.pl or speedscope.
+    Runs next to the counter, so the process does not have to be restarted and keeps its count.
+    """
+
+    def __init__(self, outputDirectory: str = ".", interval: float = 0.005, duration: float = 30, maxDuration: float = 300) -> None:
+        """
+        Args:
+            outputDirectory (str, optional): Where profiles are written to. Defaults to ".".
+            interval (float, optional): Seconds between samples. Defaults to 0.005.
+            duration (float, optional): Default seconds to profile for. Defaults to 30.
+            maxDuration (float, optional): Longer requested profiles are cut to this many seconds. Defaults to 300.
+        """
+        self.outputDirectory = outputDirectory
+        self.interval = interval
+        self.duration = duration
+        self.maxDuration = maxDuration
+        self.lock = threading.Lock()
+
+    def installSignalHandler(self, signum: int = signal.SIGUSR1) -> None:
+        """Profiles in the background whenever the process receives the signal, e.g. `kill -USR1 <pid>`. Must be called from the main thread.
+        """
+        signal.signal(signum, lambda signum, frame: self.start())
+
+    def start(self, duration: float = None) -> bool:
+        """Starts profiling in the background.
+
+        Returns:
+            bool: False, if a profile is already running.
+        """
+        if self.lock.locked():
+            return False
+
+        threading.Thread(target=self.profile, args=(duration,), daemon=True).start()
+        return True
+
+    def profile(self, duration: float = None) -> Dict:
+        """Profiles for the given duration and blocks until done.
+
+        Args:
+            duration (float, optional): Seconds to profile for, at most the configured maximum. Defaults to the configured duration.
+
+        Raises:
+            ValueError: If the duration is not a positive number.
+
+        Returns:
+            Dict: Path of the written profile and number of samples. None if a profile is already running.
+        """
+        duration = duration if duration is not None else self.duration
+        if not math.isfinite(duration) or duration <= 0:
+            raise ValueError(f'Invalid profile duration {duration}')
+        duration = min(duration, self.maxDuration)
+
+        if not self.lock.acquire(blocking=False):
+            return None
+
+        try:
+            logging.info(f'Profiling for {duration} seconds')
+
+            stacks = Counter()
+            samples = 0
+            end = monotonic() + duration
+            ownId = threading.get_ident()
+            while monotonic() < end:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for threadId, frame in sys._current_frames().items():
+                    if threadId == ownId:
+                        continue
+                    stacks[self.collapse(names.get(threadId, str(threadId)), frame)] += 1
+                samples += 1
+                sleep(self.interval)
+
+            path = os.path.join(self.outputDirectory, f'profile-{datetime.now():%Y%m%d-%H%M%S}.folded')
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+
+            logging.info(f'Profile with {samples} samples written to {path}')
+            return {'path': path, 'samples': samples}
+        finally:
+            self.lock.release()
+
+    def collapse(self, threadName: str, frame) -> str:
+        functions = []
+        while frame is not None:
+            code = frame.f_code
+            functions.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        # Short lived callback threads are numbered, merge them by dropping the number
+        threadName = re.sub(r"-\d+", "", threadName).replace(" ", "_")
+        # Root first, separated by semicolons
+        return ";".join([threadName] + [f.replace(";", ":") for f in reversed(functions)])
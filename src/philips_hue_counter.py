@@ -1,13 +1,29 @@
-from datetime import datetime
-from typing import Dict
+from datetime import datetime, timedelta
 from interface.philips_hue import PhilipsHue
-from sensor.people_counter import PeopleCounter
+from monitoring.fault_detector import FaultDetector
+from monitoring.metrics_server import MetricsServer
+from monitoring.profiler import SamplingProfiler
+from sensor.people_counter import DirectionStateSnapshot, PeopleCounter
+from sensor.data_ready import GpioDataReadySource
 from sensor.vl53l1x_sensor import VL53L1XSensor
+from sensor.watchdog_sensor import WatchdogSensor
+from sensor.shared_ring_counter import SharedRingCounter
+from storage.event_codec import encode_event_json
+from storage.event_log import EventLog
+from storage.snapshot import restore_from_last_entry, save_snapshot
 import logging
-import json
+from timeloop import Timeloop
 
 
 LOG_FILE_PATH = "log.txt"   # Path for logs
+COMPACT_LOG = False  # Log events in the fast fixed schema (v1.0) instead of the full direction state (v0.0). Lossy: only keeps count and minimum of the trigger distances
+SNAPSHOT_FILE_PATH = "snapshot.json"    # Path for periodic snapshots of the counter state
+SNAPSHOT_INTERVAL = timedelta(minutes=1)
+METRICS_PORT = 8000     # Port for live metrics at /metrics. None to disable
+METRICS_HOST = "127.0.0.1"    # Only serve metrics and profiles locally. "" to serve the whole network
+USE_SENSOR_DAEMON = False   # Read events of a running sensor_daemon.py instead of opening the sensor
+SENSOR_LANES = 1    # Lanes side by side in the doorway, counted separately, e.g. 2 for a double-width door
+DATA_READY_PIN = None  # BCM pin wired to GPIO1 of the sensor, to read measurements as soon as they are ready. None to poll
 hue_conf = {
     'bridge_ip': '',
     'transition_time': 10,  # seconds
@@ -17,32 +33,44 @@ hue_conf = {
 }   # Custom configuration for philips hue
 
 
+def create_sensor() -> VL53L1XSensor:
+    dataReady = None if DATA_READY_PIN is None else GpioDataReadySource(DATA_READY_PIN)
+    return VL53L1XSensor(dataReady, lanes=SENSOR_LANES)
+
+
 hue: PhilipsHue = PhilipsHue(hue_conf)  # Light interface
-counter: PeopleCounter = PeopleCounter(VL53L1XSensor())  # Sensor object
+event_log: EventLog = EventLog(LOG_FILE_PATH)   # Indexed log of all events
+fault_detector: FaultDetector = FaultDetector()    # Rolling fault rates of the count
+counter: PeopleCounter = SharedRingCounter() if USE_SENSOR_DAEMON else PeopleCounter(WatchdogSensor(create_sensor(), sensorFactory=create_sensor))  # Sensor object
 peopleCount: int = 0    # Global count of people on the inside
+timeloop: Timeloop = Timeloop()  # Used for periodic snapshots
 
 logging.getLogger().setLevel(logging.INFO)
 
 
-def change_cb(countChange: int, directionState: Dict):
+def change_cb(countChange: int, directionState: DirectionStateSnapshot):
     """Handles basic logging of event data for later analysis.
 
     Args:
         countChange (int): The change in the number of people. Usually on of [-1, 0, 1].
-        directionState (Dict): Object describing the internal state of the sensor.
+        directionState (DirectionStateSnapshot): Immutable copy of the internal state of the sensor.
     """
-    data = {
-        'version': 'v0.0',
-        'previousPeopleCount': peopleCount,
-        'countChange': countChange,
-        'directionState': directionState,
-        'dateTime': datetime.now(),
-        'motionTriggeredLights': False
-    }
+    fault_detector.observeChange(peopleCount, countChange, directionState)
+    now = datetime.now()
 
     try:
-        with open(LOG_FILE_PATH, 'a') as f:
-            f.write(json.dumps(data, default=str) + "\n")
+        if COMPACT_LOG:
+            event_log.append_line(encode_event_json(peopleCount, countChange, directionState, now, False), now)
+        else:
+            data = {
+                'version': 'v0.0',
+                'previousPeopleCount': peopleCount,
+                'countChange': countChange,
+                'directionState': directionState.toDict(),
+                'dateTime': now,
+                'motionTriggeredLights': False
+            }
+            event_log.append(data, now)
     except Exception as ex:
         logging.exception(f'Unable to write log file. {ex}')
 
@@ -62,10 +90,12 @@ def count_change(change: int) -> None:
     # Apply correction
     if peopleCount <= 0 and previous_lights_state:
         # Count was 0, but lights were on => people count was not actually 0
+        fault_detector.observeCorrection(peopleCount)
         peopleCount = 1
         logging.debug(f'People count corrected to {peopleCount}')
     elif peopleCount > 0 and not previous_lights_state:
         # Count was >0, but lights were off => people count was actually 0
+        fault_detector.observeCorrection(peopleCount)
         peopleCount = 0
         logging.debug(f'People count corrected to {peopleCount}')
 
@@ -113,9 +143,55 @@ def get_light_state() -> bool:
     return hue.get_group(hue_conf['light_group'])['state']['any_on']
 
 
+def save_state():
+    """Called by time trigger to save a snapshot of the counter state.
+    """
+    try:
+        save_snapshot(SNAPSHOT_FILE_PATH, LOG_FILE_PATH, peopleCount, False, counter.getDirectionStateSnapshot().toDict())
+    except Exception as ex:
+        logging.exception(f'Unable to write snapshot. {ex}')
+
+
+def restore_previous_state():
+    """Restores the counter state of the previous run from the latest snapshot and log.
+    """
+    global peopleCount
+
+    state = restore_from_last_entry(SNAPSHOT_FILE_PATH, LOG_FILE_PATH)
+    if state is None:
+        return
+
+    peopleCount = state['peopleCount']
+    if state['directionState'] is not None:
+        counter.restoreDirectionState(state['directionState'])
+
+    logging.info(f'Restored people count of {peopleCount}')
+
+
 if __name__ == "__main__":
+    restore_previous_state()
+    timeloop._add_job(save_state, interval=SNAPSHOT_INTERVAL)
+    timeloop.start(block=False)
+
+    profiler = SamplingProfiler()
+    profiler.installSignalHandler()  # Profile on SIGUSR1
+
+    if METRICS_PORT is not None:
+        metrics_server = MetricsServer(METRICS_PORT, METRICS_HOST)
+        metrics_server.addMetrics('people_count', lambda: {'count': peopleCount})
+        metrics_server.addMetrics('faults', fault_detector.getMetrics)
+        metrics_server.addMetrics('sampling_modes', counter.getSamplingModeDurations)
+        if not USE_SENSOR_DAEMON:
+            metrics_server.addMetrics('sensor', counter.sensor.getMetrics)
+        # Blocks until done, e.g. /profile?seconds=10, at most 300 seconds
+        metrics_server.addRoute('/profile', lambda query: profiler.profile(float(query.get('seconds', [profiler.duration])[0])))
+        metrics_server.start()
+
     # Represents callback trigger order
     counter.hookChange(change_cb)
     counter.hookCounting(count_change)
 
-    counter.run()
+    try:
+        counter.run()
+    finally:
+        save_state()
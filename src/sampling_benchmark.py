@@ -0,0 +1,46 @@
+from sensor.people_counter import PeopleCounter
+from sensor.trace_sensor import TraceSensor, generateTrace
+from sensor.tof_sensor import SamplingModes
+import threading
+import time
+
+
+CROSSINGS = 10  # Number of crossings per synthetic trace
+SEED = 42       # Same trace for every run
+
+
+def run_trace(adaptive: bool) -> None:
+    """Runs the counter on a synthetic trace and prints detections and time spent per sampling mode.
+
+    Args:
+        adaptive (bool): Should adaptive sampling be enabled.
+    """
+    trace = generateTrace(CROSSINGS, seed=SEED)
+    sensor = TraceSensor(trace)
+    counter = PeopleCounter(sensor)
+    if not adaptive:
+        counter.idleTimeout = None
+
+    changes = []
+    counter.hookCounting(changes.append)
+
+    th = threading.Thread(target=counter.run)
+    th.start()
+    time.sleep(sensor.getDuration() + 1)
+    counter.stop()
+    th.join()
+
+    expected = [c.countChange for c in trace]
+    durations = counter.getSamplingModeDurations()
+    print("Adaptive sampling:", adaptive)
+    print("Detected crossings:", len(changes), "of", len(expected))
+    print("Correct directions:", changes == expected)
+    print("Measurements:", sensor.measurementCount)
+    for mode in SamplingModes:
+        print(f"Time in {mode.value} mode: {durations[mode]:.1f} s")
+    print("-"*20)
+
+
+if __name__ == "__main__":
+    run_trace(adaptive=False)
+    run_trace(adaptive=True)
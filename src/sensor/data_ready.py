@@ -0,0 +1,82 @@
+from typing import Dict
+import threading
+
+
+class DataReadySource:
+    """Signals that the sensor finished a new measurement, so it can be read without polling.
+    """
+
+    def open(self) -> None:
+        pass
+
+    def clear(self) -> None:
+        """Forget any pending signal, e.g. after the sensor was reconfigured.
+        """
+        raise NotImplementedError()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Blocks until new data is ready.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait. Defaults to None, waiting forever.
+
+        Returns:
+            bool: True if new data is ready, False if timed out.
+        """
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+
+class EventDataReadySource (DataReadySource):
+    """Data-ready source driven by calling signal(), e.g. from an interrupt handler or a fake sensor.
+    """
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+
+    def signal(self) -> None:
+        self.event.set()
+
+    def clear(self) -> None:
+        self.event.clear()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.event.wait(timeout)
+
+
+class GpioDataReadySource (EventDataReadySource):
+    """Uses the GPIO1 interrupt pin of the VL53L1X, which is pulled low once a measurement is ready.
+
+    A pin only has one edge detection. The source opened last owns it, so a sensor replacing a stalled one
+    can take over the pin, while the stalled sensor closing later does not remove it.
+    """
+
+    owners: Dict[int, 'GpioDataReadySource'] = {}   # Source with the edge detection per pin
+    ownersLock = threading.Lock()
+
+    def __init__(self, pin: int) -> None:
+        super().__init__()
+        self.pin = pin  # BCM pin number connected to GPIO1 of the sensor
+
+    def open(self) -> None:
+        import RPi.GPIO as GPIO
+        self.gpio = GPIO
+
+        with self.ownersLock:
+            if self.pin in self.owners:
+                self.gpio.remove_event_detect(self.pin)
+            self.owners[self.pin] = self
+
+            self.gpio.setmode(GPIO.BCM)
+            self.gpio.setup(self.pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            self.gpio.add_event_detect(self.pin, GPIO.FALLING, callback=lambda channel: self.signal())
+
+    def close(self) -> None:
+        with self.ownersLock:
+            if self.owners.get(self.pin) is not self:
+                return
+            del self.owners[self.pin]
+            self.gpio.remove_event_detect(self.pin)
+            self.gpio.cleanup(self.pin)
@@ -0,0 +1,67 @@
+from sensor.tof_sensor import Directions, SamplingModes, ToFSensor, Zone
+from time import sleep
+import random
+
+
+class FaultySensor (ToFSensor):
+    """Wraps another sensor and injects stalls and errors into its measurements, like a glitching I2C bus.
+    Meant for testing the WatchdogSensor, e.g. together with the TraceSensor.
+    """
+
+    def __init__(self, sensor: ToFSensor, stallProbability: float = 0.01, errorProbability: float = 0.01,
+                 stallDuration: float = 10, failedOpens: int = 0, seed: int = None) -> None:
+        """
+        Args:
+            sensor (ToFSensor): Sensor that provides the actual measurements.
+            stallProbability (float, optional): Chance of a measurement to hang. Defaults to 0.01.
+            errorProbability (float, optional): Chance of a measurement to raise an OSError. Defaults to 0.01.
+            stallDuration (float, optional): Seconds a stalled measurement hangs. Defaults to 10.
+            failedOpens (int, optional): Number of times opening fails after each injected fault. Defaults to 0.
+            seed (int, optional): Seed for reproducible faults. Defaults to None.
+        """
+        super().__init__()
+        self.sensor = sensor
+        self.lanes = sensor.lanes
+        self.stallProbability = stallProbability
+        self.errorProbability = errorProbability
+        self.stallDuration = stallDuration
+        self.failedOpens = failedOpens
+        self.random = random.Random(seed)
+
+        self.remainingFailedOpens = 0
+        self.injectedStalls = 0
+        self.injectedErrors = 0
+
+    def open(self) -> None:
+        if self.remainingFailedOpens > 0:
+            self.remainingFailedOpens -= 1
+            raise OSError("Injected open failure")
+        self.sensor.open()
+
+    def setDirection(self, direction: Directions) -> None:
+        self.sensor.setDirection(direction)
+
+    def setZone(self, zone: Zone) -> None:
+        self.sensor.setZone(zone)
+
+    def setSamplingMode(self, mode: SamplingModes) -> None:
+        self.sensor.setSamplingMode(mode)
+
+    def getDistance(self) -> float:
+        fault = self.random.random()
+        if fault < self.stallProbability:
+            self.injectedStalls += 1
+            self.remainingFailedOpens = self.failedOpens
+            sleep(self.stallDuration)
+        elif fault < self.stallProbability + self.errorProbability:
+            self.injectedErrors += 1
+            self.remainingFailedOpens = self.failedOpens
+            raise OSError("Injected I2C error")
+
+        return self.sensor.getDistance()
+
+    def getMaxMeasurementTime(self) -> float:
+        return self.sensor.getMaxMeasurementTime()
+
+    def close(self) -> None:
+        self.sensor.close()
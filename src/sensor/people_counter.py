@@ -1,23 +1,102 @@
-from typing import Dict
-from sensor.tof_sensor import ToFSensor, Directions
+from collections.abc import Mapping
+from typing import Dict, NamedTuple, Tuple
+from sensor.tof_sensor import ToFSensor, Directions, SamplingModes, Zone, getScanOrder
 from datetime import datetime
+from time import monotonic, sleep
+import logging
 import threading
 
 
 COUNTING_CB = "counting"
 TRIGGER_CB = "trigger"
 CHANGE_CB = "changes"
+READING_CB = "readings"
 START_TIME = "start_time"
 END_TIME = "end_time"
 TRIGGER_DISTANCES = "trigger_distances"
 END_DISTANCE = "end_distance"
+TRIGGER_COUNT = "trigger_count"
+MIN_DISTANCE = "min_distance"
+
+
+class DirectionRecord (NamedTuple):
+    """Immutable copy of a single trigger period of a direction. Field names match the keys of the live state.
+    """
+    start_time: datetime
+    end_time: datetime
+    trigger_distances: Tuple[float, ...]
+    end_distance: float
+    # Only set for records that were summarised on the way, their trigger distances are empty then
+    trigger_count: int = None
+    min_distance: float = None
+
+    def toDict(self) -> Dict:
+        data = self._asdict()
+        if self.trigger_count is None:
+            del data[TRIGGER_COUNT]
+            del data[MIN_DISTANCE]
+        return data
+
+
+class DirectionStateSnapshot (Mapping):
+    """Immutable copy of the direction state, handed to callbacks.
+    Can be shared between threads and read without locks, since the counter never changes it.
+    """
+    __slots__ = ("_states", "lane")
+
+    def __init__(self, directionState: Dict, lane: int = 0) -> None:
+        self._states = {direction: tuple(DirectionRecord(record[START_TIME], record[END_TIME], tuple(record[TRIGGER_DISTANCES]), record[END_DISTANCE],
+                                                         record.get(TRIGGER_COUNT), record.get(MIN_DISTANCE))
+                                         for record in records)
+                        for direction, records in directionState.items()}
+        self.lane = lane    # Lane of the doorway the state belongs to
+
+    @classmethod
+    def fromDict(cls, data: Dict, lane: int = 0) -> 'DirectionStateSnapshot':
+        """Creates a snapshot from its serialized form, as returned by toDict after a JSON round trip.
+        """
+        directionState = {}
+        for direction in Directions:
+            directionState[direction] = []
+            for record in data.get(direction.value, []):
+                record = dict(record)
+                for key in [START_TIME, END_TIME]:
+                    if isinstance(record[key], str):
+                        record[key] = datetime.fromisoformat(record[key])
+                directionState[direction].append(record)
+        return cls(directionState, lane)
+
+    def __getitem__(self, direction: Directions) -> Tuple[DirectionRecord, ...]:
+        return self._states[direction]
+
+    def __iter__(self):
+        return iter(self._states)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def toDict(self) -> Dict:
+        """
+        Returns:
+            Dict: Plain representation for serialization, in the same format as the log entries.
+        """
+        return {direction.value: [record.toDict() for record in records] for direction, records in self._states.items()}
 
 
 class PeopleCounter ():
     def __init__(self, sensor: ToFSensor) -> None:
         self.sensor = sensor
-        self.callbacks = {COUNTING_CB: [], TRIGGER_CB: [], CHANGE_CB: []}
+        self.callbacks = {COUNTING_CB: [], TRIGGER_CB: [], CHANGE_CB: [], READING_CB: []}
         self.maxTriggerDistance = 120   # In cm
+        # Seconds without any trigger until switching to idle mode. None disables adaptive sampling
+        self.idleTimeout = 3
+        self.idleSampleInterval = 0.05  # In seconds, pause between measurements in idle mode
+
+        self.samplingMode = SamplingModes.BURST
+        self.samplingModeStart = None
+        self.samplingModeDurations = {mode: 0.0 for mode in SamplingModes}
+        self.lanes = sensor.lanes if sensor is not None else 1
+        self.directionStates = [self.getInitialDirectionState() for _ in range(self.lanes)]  # One per lane
 
     def hookCounting(self, cb) -> None:
         self.callbacks[COUNTING_CB].append(cb)
@@ -37,39 +116,106 @@ class PeopleCounter ():
     def unhookChange(self, cb) -> None:
         self.callbacks[CHANGE_CB].remove(cb)
 
+    def hookReading(self, cb) -> None:
+        """Called with direction and distance for every measurement, directly in the sensor loop. Keep it fast.
+        """
+        self.callbacks[READING_CB].append(cb)
+
+    def unhookReading(self, cb) -> None:
+        self.callbacks[READING_CB].remove(cb)
+
     def getInitialDirectionState(self) -> Dict:
         return {
             Directions.INSIDE: [],
             Directions.OUTSIDE: []
         }
 
+    def getDirectionStateSnapshot(self, lane: int = 0) -> DirectionStateSnapshot:
+        return DirectionStateSnapshot(self.directionStates[lane], lane)
+
+    def restoreDirectionState(self, directionState: Dict, lane: int = 0) -> None:
+        """Continues with a previously saved direction state, e.g. after a restart. Must be called before run.
+        """
+        self.directionStates[lane] = directionState
+
     def run(self) -> None:
         self.keepRunning = True
-        direction = Directions.INSIDE
-        self.directionState = self.getInitialDirectionState()
+        scanOrder = getScanOrder(self.lanes)
+        position = 0
 
         self.sensor.open()
-        while self.keepRunning:
-            # Switch to other direction
-            direction: Directions = Directions.other(direction)
-
-            self.sensor.setDirection(direction)
-
-            distance: float = self.sensor.getDistance()
-            changed: bool = self.updateState(direction, distance)
-
-            if changed:
-                countChange: int = self.getCountChange(self.directionState)
-                
-                # Hooks
-                th = threading.Thread(target=self.handleCallbacks, args=(countChange,))
-                th.start()
-
-                # Reset state if state is finalised
-                if not self.isDirectionTriggered(Directions.INSIDE) and not self.isDirectionTriggered(Directions.OUTSIDE):
-                    self.directionState = self.getInitialDirectionState()
-
-        self.sensor.close()
+        try:
+            self.setSamplingMode(SamplingModes.BURST)
+            lastTriggerTime = monotonic()
+            while self.keepRunning:
+                # Switch to next zone
+                zone: Zone = scanOrder[position]
+                position = (position + 1) % len(scanOrder)
+
+                self.sensor.setZone(zone)
+
+                distance: float = self.sensor.getDistance()
+                if distance is None:
+                    # No new measurement, do not count a stale one twice
+                    continue
+
+                for cb in self.callbacks[READING_CB]:
+                    cb(zone.direction, distance)
+
+                changed: bool = self.updateState(zone.direction, distance, zone.lane)
+
+                if changed:
+                    countChange: int = self.getCountChange(self.directionStates[zone.lane])
+
+                    # Hooks get their own copy of the state, since it keeps changing here
+                    th = threading.Thread(target=self.handleCallbacks,
+                                          args=(countChange, self.getDirectionStateSnapshot(zone.lane), self.getTriggerState()))
+                    th.start()
+
+                    # Reset state of the lane if state is finalised
+                    if not self.isDirectionTriggered(Directions.INSIDE, zone.lane) and not self.isDirectionTriggered(Directions.OUTSIDE, zone.lane):
+                        self.directionStates[zone.lane] = self.getInitialDirectionState()
+
+                # Adapt sampling rate to the activity in the doorframe
+                triggerState = self.getTriggerState()
+                if triggerState[Directions.INSIDE] or triggerState[Directions.OUTSIDE]:
+                    lastTriggerTime = monotonic()
+                    if self.samplingMode is SamplingModes.IDLE:
+                        self.setSamplingMode(SamplingModes.BURST)
+                elif self.samplingMode is SamplingModes.BURST and self.idleTimeout is not None \
+                        and monotonic() - lastTriggerTime >= self.idleTimeout:
+                    self.setSamplingMode(SamplingModes.IDLE)
+
+                if self.samplingMode is SamplingModes.IDLE:
+                    sleep(self.idleSampleInterval)
+        finally:
+            # Also release the sensor if a callback or the sensor itself failed
+            self.updateSamplingModeDurations()
+            self.samplingModeStart = None
+            self.sensor.close()
+
+    def stop(self) -> None:
+        self.keepRunning = False
+
+    def setSamplingMode(self, mode: SamplingModes) -> None:
+        self.updateSamplingModeDurations()
+        self.samplingMode = mode
+        self.sensor.setSamplingMode(mode)
+        logging.debug(f'Switched to {mode.value} sampling mode')
+
+    def updateSamplingModeDurations(self) -> None:
+        now = monotonic()
+        if self.samplingModeStart is not None:
+            self.samplingModeDurations[self.samplingMode] += now - self.samplingModeStart
+        self.samplingModeStart = now
+
+    def getSamplingModeDurations(self) -> Dict:
+        """Returns the time spent in each sampling mode in seconds, including the currently active one.
+        """
+        durations = dict(self.samplingModeDurations)
+        if self.samplingModeStart is not None:
+            durations[self.samplingMode] += monotonic() - self.samplingModeStart
+        return durations
 
     def getCountChange(self, directionState) -> int:
         # Is valid?
@@ -132,10 +278,10 @@ class PeopleCounter ():
         #! TODO: Should be based on the distance from the ground, not from the sensor
         return distance <= self.maxTriggerDistance
     
-    def handleCallbacks(self, countChange: int):
-        self.handleChangeCallbacks(countChange)
+    def handleCallbacks(self, countChange: int, directionState: DirectionStateSnapshot, triggerState: Dict):
+        self.handleChangeCallbacks(countChange, directionState)
         self.handleCountingCallbacks(countChange)
-        self.handleTriggerCallbacks()
+        self.handleTriggerCallbacks(triggerState)
 
     def handleCountingCallbacks(self, countChange: int) -> None:
         # Only notify counting on actual count change
@@ -145,32 +291,35 @@ class PeopleCounter ():
         for cb in self.callbacks[COUNTING_CB]:
             cb(countChange)
 
-    def handleTriggerCallbacks(self) -> None:
-        triggerState = {
-            Directions.INSIDE: self.isDirectionTriggered(Directions.INSIDE),
-            Directions.OUTSIDE: self.isDirectionTriggered(Directions.OUTSIDE)
-        }
-        
+    def handleTriggerCallbacks(self, triggerState: Dict) -> None:
         for cb in self.callbacks[TRIGGER_CB]:
             cb(triggerState)
 
-    def handleChangeCallbacks(self, countChange: int) -> None:
+    def handleChangeCallbacks(self, countChange: int, directionState: DirectionStateSnapshot) -> None:
         for cb in self.callbacks[CHANGE_CB]:
-            cb(countChange, self.directionState)
+            cb(countChange, directionState)
     
-    def isDirectionTriggered(self, direction: Directions) -> bool:
-        return len(self.directionState[direction]) > 0 and self.directionState[direction][-1][END_TIME] is None
-
-    def updateState(self, direction: Directions, distance: float) -> bool:
+    def isDirectionTriggered(self, direction: Directions, lane: int = 0) -> bool:
+        directionState = self.directionStates[lane]
+        return len(directionState[direction]) > 0 and directionState[direction][-1][END_TIME] is None
+
+    def getTriggerState(self) -> Dict:
+        """Describes in what directions the sensor is triggered, in any of the lanes.
+        """
+        return {direction: any(self.isDirectionTriggered(direction, lane) for lane in range(self.lanes))
+                for direction in [Directions.INSIDE, Directions.OUTSIDE]}
+
+    def updateState(self, direction: Directions, distance: float, lane: int = 0) -> bool:
+        directionState = self.directionStates[lane]
         triggered: bool = self.isTriggerDistance(distance)
         
         previouslyTriggered = False
-        if len(self.directionState[direction]) > 0:
-            previouslyTriggered = self.directionState[direction][-1][END_TIME] is None
+        if len(directionState[direction]) > 0:
+            previouslyTriggered = directionState[direction][-1][END_TIME] is None
 
         if triggered and not previouslyTriggered:
             # Set as new beginning for this direction
-            self.directionState[direction].append({
+            directionState[direction].append({
                 START_TIME: datetime.now(),
                 END_TIME: None,
                 TRIGGER_DISTANCES: [distance],
@@ -179,11 +328,11 @@ class PeopleCounter ():
             return True
         elif not triggered and previouslyTriggered:
             # Set as end for this direction
-            self.directionState[direction][-1][END_TIME] = datetime.now()
-            self.directionState[direction][-1][END_DISTANCE] = distance
+            directionState[direction][-1][END_TIME] = datetime.now()
+            directionState[direction][-1][END_DISTANCE] = distance
             return True
         elif previouslyTriggered:
             # Add distance at least
-            self.directionState[direction][-1][TRIGGER_DISTANCES].append(distance)
+            directionState[direction][-1][TRIGGER_DISTANCES].append(distance)
 
         return False
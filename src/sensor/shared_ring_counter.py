@@ -0,0 +1,71 @@
+from interface.shared_ring import DEFAULT_RING_NAME, BINARY_PAYLOAD, CHANGE, READING, TRIGGER, SharedRingReader
+from sensor.people_counter import DirectionStateSnapshot, PeopleCounter, TRIGGER_CB, CHANGE_CB, READING_CB, START_TIME, END_TIME, TRIGGER_DISTANCES, END_DISTANCE, \
+    TRIGGER_COUNT, MIN_DISTANCE
+from sensor.tof_sensor import Directions
+from storage.event_codec import decode_event_binary, from_millis
+from time import sleep
+import json
+import logging
+
+
+class SharedRingCounter (PeopleCounter):
+    """Drop-in replacement for the PeopleCounter, that consumes the events published by a running sensor_daemon.py
+    instead of opening the sensor itself. Any number of these can run next to each other.
+    """
+
+    def __init__(self, name: str = DEFAULT_RING_NAME, pollInterval: float = 0.01) -> None:
+        super().__init__(None)
+        self.name = name
+        self.pollInterval = pollInterval    # In seconds, pause when no new records are available
+
+    def run(self) -> None:
+        self.keepRunning = True
+        reader = SharedRingReader(self.name)
+        missed = 0
+
+        while self.keepRunning:
+            records = reader.read()
+            if len(records) <= 0:
+                sleep(self.pollInterval)
+                continue
+
+            if reader.missed > missed:
+                logging.warning(f'Missed {reader.missed - missed} records of the sensor daemon')
+                missed = reader.missed
+
+            for record in records:
+                if record.kind == READING:
+                    for cb in self.callbacks[READING_CB]:
+                        cb(record.direction, record.distance)
+                elif record.kind == CHANGE:
+                    directionState = self.decodeDirectionState(record.payload, record.lane)
+                    for cb in self.callbacks[CHANGE_CB]:
+                        cb(record.countChange, directionState)
+                    self.handleCountingCallbacks(record.countChange)
+                elif record.kind == TRIGGER:
+                    for cb in self.callbacks[TRIGGER_CB]:
+                        cb(record.triggerState)
+
+        reader.close()
+
+    def decodeDirectionState(self, payload: bytes, lane: int = 0) -> DirectionStateSnapshot:
+        if len(payload) <= 0:
+            # Change published without its state
+            return DirectionStateSnapshot({direction: [] for direction in Directions}, lane)
+
+        if payload[:1] == BINARY_PAYLOAD:
+            event, _ = decode_event_binary(payload, 1)
+            directionState = {}
+            for direction in Directions:
+                # Only the count and minimum of the trigger distances are left
+                directionState[direction] = [{
+                    START_TIME: from_millis(record["start_time"]),
+                    END_TIME: from_millis(record["end_time"]),
+                    TRIGGER_DISTANCES: [],
+                    END_DISTANCE: record["end_distance"],
+                    TRIGGER_COUNT: record["trigger_count"],
+                    MIN_DISTANCE: record["min_distance"]
+                } for record in event["directionState"][direction.value]]
+            return DirectionStateSnapshot(directionState, lane)
+
+        return DirectionStateSnapshot.fromDict(json.loads(payload[1:]), lane)
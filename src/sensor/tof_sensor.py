@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import List, NamedTuple
 
 
 class Directions(str, Enum):
@@ -15,7 +16,36 @@ class Directions(str, Enum):
         return [Directions.INSIDE, Directions.OUTSIDE]
 
 
+class SamplingModes(str, Enum):
+    IDLE = "idle"   # Low sample rate with a longer timing budget, while nothing moves
+    BURST = "burst"  # Maximum sample rate, while someone is in the doorframe
+
+
+class Zone (NamedTuple):
+    """Area of the doorframe the sensor can measure in. Wide doorways are split into lanes side by side,
+    each with a zone on the inside and one on the outside.
+    """
+    lane: int
+    direction: Directions
+
+
+def getScanOrder(lanes: int) -> List[Zone]:
+    """Order to measure the zones of all lanes in, round-robin.
+    The zones of a lane are always measured right after each other, and consecutive lanes share a direction
+    (inside, outside, outside, inside, ...), so the crossings of each lane are resolved from back-to-back measurements.
+    """
+    order = []
+    for lane in range(lanes):
+        directions = [Directions.INSIDE, Directions.OUTSIDE]
+        if lane % 2 == 1:
+            directions.reverse()
+        order.extend(Zone(lane, direction) for direction in directions)
+    return order
+
+
 class ToFSensor:
+    lanes = 1   # Number of lanes the sensor measures zones for
+
     def open(self) -> None:
         raise NotImplementedError()
 
@@ -24,10 +54,27 @@ class ToFSensor:
         """
         raise NotImplementedError()
 
+    def setZone(self, zone: Zone) -> None:
+        """Configure sensor to pick up the distance in a specific zone.
+        Sensors with a single lane only need to implement setDirection.
+        """
+        self.setDirection(zone.direction)
+
+    def setSamplingMode(self, mode: SamplingModes) -> None:
+        """Optionally adjust the sensor timing to the sampling mode of the counter.
+        Does nothing by default.
+        """
+        pass
+
     def getDistance(self) -> float:
-        """Returns new distance in cm.
+        """Returns new distance in cm, or None if no new measurement is available.
         """
         raise NotImplementedError()
 
+    def getMaxMeasurementTime(self) -> float:
+        """Returns the seconds getDistance may take at most, while the sensor works as expected. None if unknown.
+        """
+        return None
+
     def close(self) -> None:
         raise NotImplementedError()
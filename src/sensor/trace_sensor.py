@@ -0,0 +1,153 @@
+from typing import List, NamedTuple
+from sensor.data_ready import EventDataReadySource
+from sensor.tof_sensor import Directions, SamplingModes, ToFSensor, Zone
+from time import monotonic, sleep
+import random
+import threading
+
+
+class Crossing (NamedTuple):
+    start: float        # Seconds after the sensor was first opened
+    duration: float     # Seconds the person spends in the doorframe
+    countChange: int    # 1 for entering the inside, -1 for leaving it
+    lane: int = 0       # Lane of a wide doorway the person walks through
+
+
+class TraceSensor (ToFSensor):
+    """Replays a synthetic trace of people walking through the doorframe in real time.
+    Meant for benchmarks and development without the actual hardware.
+    """
+
+    def __init__(self, crossings: List[Crossing], floorDistance: float = 250, personDistance: float = 80,
+                 dataReady: EventDataReadySource = None) -> None:
+        """
+        Args:
+            crossings (List[Crossing]): Crossings to replay.
+            floorDistance (float, optional): Distance in cm when nobody is in a zone. Defaults to 250.
+            personDistance (float, optional): Distance in cm when someone is in a zone. Defaults to 80.
+            dataReady (EventDataReadySource, optional): Signalled once a measurement is ready, like the interrupt pin of the VL53L1X,
+                so reads block on it. Defaults to None, sleeping for the measurement time instead.
+        """
+        super().__init__()
+        self.crossings = crossings
+        self.lanes = max((c.lane for c in crossings), default=0) + 1
+        self.floorDistance = floorDistance      # In cm, returned when nobody is in a zone
+        self.personDistance = personDistance    # In cm, returned when someone is in a zone
+        # Seconds a single measurement takes, emulating the timing budget of each mode
+        self.measurementTimes = {
+            SamplingModes.IDLE: 0.1,
+            SamplingModes.BURST: 0.033
+        }
+        self.measurementTime = self.measurementTimes[SamplingModes.BURST]
+        self.zone = Zone(0, Directions.INSIDE)
+        self.measurementCount = 0
+        self.openTime = None
+        self.dataReady = dataReady
+        self.measurement: threading.Timer = None    # Signals the data-ready source once the running measurement is done
+
+    def open(self) -> None:
+        # Reopening, e.g. after a recovery, continues the trace where it is
+        if self.openTime is None:
+            self.openTime = monotonic()
+        if self.dataReady is not None:
+            self.dataReady.open()
+            self.startMeasurement()
+
+    def setDirection(self, direction: Directions) -> None:
+        self.setZone(Zone(0, direction))
+
+    def setZone(self, zone: Zone) -> None:
+        # Like the VL53L1X, a new zone restarts ranging
+        if zone != self.zone and self.dataReady is not None:
+            self.startMeasurement()
+        self.zone = zone
+
+    def setSamplingMode(self, mode: SamplingModes) -> None:
+        self.measurementTime = self.measurementTimes[mode]
+
+    def getDistance(self) -> float:
+        if self.dataReady is None:
+            sleep(self.measurementTime)
+        else:
+            if not self.dataReady.wait(self.measurementTime * 2):
+                return None
+            # Reading starts the next measurement, like in continuous ranging
+            self.startMeasurement()
+        self.measurementCount += 1
+
+        if self.isOccupied(self.zone, self.getElapsedTime()):
+            return self.personDistance
+        return self.floorDistance
+
+    def getMaxMeasurementTime(self) -> float:
+        if self.dataReady is not None:
+            # Waiting for the data-ready signal gives up after twice the measurement time
+            return max(self.measurementTimes.values()) * 2
+        return max(self.measurementTimes.values())
+
+    def close(self) -> None:
+        if self.measurement is not None:
+            self.measurement.cancel()
+            self.measurement = None
+        if self.dataReady is not None:
+            self.dataReady.close()
+
+    def startMeasurement(self) -> None:
+        if self.measurement is not None:
+            self.measurement.cancel()
+        self.dataReady.clear()
+        self.measurement = threading.Timer(self.measurementTime, self.dataReady.signal)
+        self.measurement.daemon = True
+        self.measurement.start()
+
+    def getElapsedTime(self) -> float:
+        return monotonic() - self.openTime
+
+    def getDuration(self) -> float:
+        """Returns the time in seconds until the last crossing is completed.
+        """
+        return max((c.start + c.duration for c in self.crossings), default=0)
+
+    def isOccupied(self, zone: Zone, time: float) -> bool:
+        for crossing in self.crossings:
+            if crossing.lane != zone.lane:
+                continue
+
+            # The zone of the starting side is occupied in the first 60% of the crossing, the other one in the last 60%
+            firstDirection = Directions.OUTSIDE if crossing.countChange > 0 else Directions.INSIDE
+            if zone.direction is firstDirection:
+                start = crossing.start
+                end = crossing.start + crossing.duration * 0.6
+            else:
+                start = crossing.start + crossing.duration * 0.4
+                end = crossing.start + crossing.duration
+
+            if start <= time < end:
+                return True
+        return False
+
+
+def generateTrace(count: int, minGap: float = 1, maxGap: float = 10, duration: float = 1, seed: int = None, lanes: int = 1) -> List[Crossing]:
+    """Generates crossings in random directions with random idle gaps in between.
+
+    Args:
+        count (int): Number of crossings.
+        minGap (float, optional): Minimal seconds between two crossings. Defaults to 1.
+        maxGap (float, optional): Maximal seconds between two crossings. Defaults to 10.
+        duration (float, optional): Seconds a single crossing takes. Defaults to 1.
+        seed (int, optional): Seed for reproducible traces. Defaults to None.
+        lanes (int, optional): Number of lanes to spread the crossings over randomly. Defaults to 1.
+
+    Returns:
+        List[Crossing]: Generated crossings in chronological order.
+    """
+    rng = random.Random(seed)
+    crossings = []
+    time = 0
+    for _ in range(count):
+        time += rng.uniform(minGap, maxGap)
+        countChange = rng.choice([1, -1])
+        lane = rng.randrange(lanes) if lanes > 1 else 0
+        crossings.append(Crossing(time, duration, countChange, lane))
+        time += duration
+    return crossings
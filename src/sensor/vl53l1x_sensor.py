@@ -1,4 +1,6 @@
-from sensor.tof_sensor import Directions, ToFSensor
+from typing import Dict, Tuple
+from sensor.tof_sensor import Directions, SamplingModes, ToFSensor, Zone
+from sensor.data_ready import DataReadySource
 import VL53L1X
 
 # Reference: https://github.com/pimoroni/vl53l1x-python
@@ -17,15 +19,60 @@ import VL53L1X
 # 0__________15
 #
 
+# Timing budget in microseconds and inter-measurement time in milliseconds per sampling mode
+SAMPLING_TIMINGS = {
+    SamplingModes.IDLE: (100000, 100),
+    SamplingModes.BURST: (33000, 33)
+}
+
+
+def getZoneRois(lanes: int = 1) -> Dict[Zone, Tuple[int, int, int, int]]:
+    """Splits the SPAD matrix into lanes side by side, with a 4x4 ROI per zone in the middle of each lane.
+    A single lane results in the original centered inside and outside ROIs.
+
+    Returns:
+        Dict[Zone, Tuple[int, int, int, int]]: Top-left x, top-left y, bottom-right x and bottom-right y of the ROI per zone.
+    """
+    width = 16 // lanes
+    if width < 4:
+        raise ValueError(f"At most 4 lanes fit on the sensor, not {lanes}")
+
+    rois = {}
+    for lane in range(lanes):
+        left = lane * width + (width - 4) // 2
+        rois[Zone(lane, Directions.INSIDE)] = (left, 3, left + 3, 0)
+        rois[Zone(lane, Directions.OUTSIDE)] = (left, 15, left + 3, 12)
+    return rois
+
 
 class VL53L1XSensor (ToFSensor):
-    def __init__(self) -> None:
+    def __init__(self, dataReady: DataReadySource = None, dataReadyTimeout: float = 1,
+                 lanes: int = 1, zoneRois: Dict[Zone, Tuple[int, int, int, int]] = None) -> None:
+        """
+        Args:
+            dataReady (DataReadySource, optional): Signals new measurements, so reads block on it instead of polling the sensor. Defaults to None, polling.
+            dataReadyTimeout (float, optional): Seconds to wait for a new measurement before giving up on it. Defaults to 1.
+            lanes (int, optional): Number of lanes side by side, e.g. 2 for a double-width door. Defaults to 1.
+            zoneRois (Dict[Zone, Tuple[int, int, int, int]], optional): Custom ROI per zone, replaces the lanes argument. Defaults to getZoneRois(lanes).
+        """
         super().__init__()
+        self.dataReady = dataReady
+        self.dataReadyTimeout = dataReadyTimeout
+
+        if zoneRois is None:
+            zoneRois = getZoneRois(lanes)
+        self.lanes = max(zone.lane for zone in zoneRois) + 1
+        # Only created once, since the ROI is switched before every single measurement
+        self.zoneRois = {zone: VL53L1X.VL53L1xUserRoi(*roi) for zone, roi in zoneRois.items()}
+        self.zone: Zone = None
 
     def open(self) -> None:
         self.sensor = VL53L1X.VL53L1X(i2c_bus=1, i2c_address=0x29)
         self.sensor.open()
 
+        if self.dataReady is not None:
+            self.dataReady.open()
+
         # Optionally set an explicit timing budget
         # These values are measurement time in microseconds,
         # and inter-measurement time in milliseconds.
@@ -37,28 +84,62 @@ class VL53L1XSensor (ToFSensor):
         # 1 = Short Range
         # 2 = Medium Range
         # 3 = Long Range
+        self.timing = None  # Timing to apply on next ranging restart
+        self.zone = None    # ROI of a new sensor has to be set
+
+    def setSamplingMode(self, mode: SamplingModes) -> None:
+        """Applies a longer timing budget in idle mode and a short one in burst mode.
+        Timing is set together with the next zone change, since ranging is restarted there anyway.
+        """
+        self.timing = SAMPLING_TIMINGS[mode]
 
     def setDirection(self, direction: Directions) -> None:
-        """Configure sensor to pick up the distance in a specific direction.
+        """Configure sensor to pick up the distance in a specific direction of the first lane.
+        """
+        self.setZone(Zone(0, direction))
+
+    def setZone(self, zone: Zone) -> None:
+        """Configure sensor to pick up the distance in a specific zone.
+        Ranging is only restarted if the zone or the timing actually changes.
         """
-        direction_roi = {
-            Directions.INSIDE: VL53L1X.VL53L1xUserRoi(6, 3, 9, 0),
-            Directions.OUTSIDE: VL53L1X.VL53L1xUserRoi(6, 15, 9, 12)
-        }
+        if zone == self.zone and self.timing is None:
+            return
 
-        roi = direction_roi[direction]
+        roi = self.zoneRois[zone]
 
         self.sensor.stop_ranging()
+        if self.timing is not None:
+            self.sensor.set_timing(*self.timing)
+            self.timing = None
         self.sensor.set_user_roi(roi)
+        if self.dataReady is not None:
+            # Do not pick up a measurement of the previous ROI
+            self.dataReady.clear()
         self.sensor.start_ranging(self.ranging)
+        self.zone = zone
 
     def getDistance(self) -> float:
-        """Returns new distance in cm.
+        """Returns new distance in cm, or None if no new measurement is available.
         """
+        if self.dataReady is not None:
+            if not self.dataReady.wait(self.dataReadyTimeout):
+                return None
+            # Reading the distance clears the interrupt and starts the next measurement
+            self.dataReady.clear()
+
         distance = self.sensor.get_distance()
 
         return distance / 10
 
+    def getMaxMeasurementTime(self) -> float:
+        if self.dataReady is not None:
+            return self.dataReadyTimeout
+        # Polling waits for the measurement with the longest timing budget
+        return max(budget for budget, _ in SAMPLING_TIMINGS.values()) / 1e6
+
     def close(self) -> None:
         self.sensor.stop_ranging()
         self.sensor.close()
+
+        if self.dataReady is not None:
+            self.dataReady.close()
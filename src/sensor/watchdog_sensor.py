@@ -0,0 +1,229 @@
+from typing import Callable, Dict
+from sensor.tof_sensor import Directions, SamplingModes, ToFSensor, Zone
+from time import monotonic, sleep
+import logging
+import queue
+import threading
+
+
+class SensorStall (Exception):
+    """A sensor call did not return within its deadline.
+    """
+    pass
+
+
+class _SensorCall ():
+    def __init__(self, fn: Callable, args: tuple) -> None:
+        self.fn = fn
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error: Exception = None
+
+
+class _SensorWorker ():
+    """Thread that runs the sensor calls. A stalled worker is abandoned and ends once its call returns, if ever.
+    """
+
+    def __init__(self) -> None:
+        self.calls: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="SensorWorker", daemon=True)
+        self.thread.start()
+
+    def call(self, fn: Callable, args: tuple, timeout: float):
+        call = _SensorCall(fn, args)
+        self.calls.put(call)
+        if not call.done.wait(timeout):
+            raise SensorStall(f'{getattr(fn, "__name__", fn)} did not return within {timeout} seconds')
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def post(self, fn: Callable, *args) -> None:
+        """Queues a call without waiting for it.
+        """
+        self.calls.put(_SensorCall(fn, args))
+
+    def run(self) -> None:
+        while True:
+            call: _SensorCall = self.calls.get()
+            if call is None:
+                return
+            try:
+                call.result = call.fn(*call.args)
+            except Exception as ex:
+                call.error = ex
+            call.done.set()
+
+    def stop(self) -> None:
+        self.calls.put(None)
+
+
+class WatchdogSensor (ToFSensor):
+    """Runs every call of the wrapped sensor with a deadline.
+    A stalled or failing sensor is closed and opened again, and gets its zone and sampling mode back,
+    while the counter only sees a few missing measurements instead of hanging or dying.
+
+    A stalled call cannot be cancelled and might still be blocked inside the sensor.
+    With a sensor factory, the stalled sensor is left alone until that call returns and a fresh one takes over.
+    Without it, the same sensor is closed and reopened next to the blocked call, which the sensor has to tolerate.
+    """
+
+    def __init__(self, sensor: ToFSensor, timeout: float = None, openTimeout: float = 5, retryInterval: float = 1,
+                 sensorFactory: Callable[[], ToFSensor] = None) -> None:
+        """
+        Args:
+            sensor (ToFSensor): Sensor to watch.
+            timeout (float, optional): Seconds a single measurement or zone change may take.
+                Has to be longer than the maximum measurement time of the sensor. Defaults to that time plus a margin of 0.5 seconds.
+            openTimeout (float, optional): Seconds opening or closing the sensor may take. Defaults to 5.
+            retryInterval (float, optional): Seconds between attempts to recover a sensor that could not be reopened. Defaults to 1.
+            sensorFactory (Callable[[], ToFSensor], optional): Creates a new sensor to replace a stalled one. Defaults to None, reusing the sensor.
+
+        Raises:
+            ValueError: If the timeout is not longer than the maximum measurement time of the sensor.
+        """
+        super().__init__()
+        self.sensor = sensor
+        self.lanes = sensor.lanes
+        self.sensorFactory = sensorFactory
+
+        maxMeasurementTime = sensor.getMaxMeasurementTime()
+        if timeout is None:
+            timeout = 0.5 if maxMeasurementTime is None else maxMeasurementTime + 0.5
+        elif maxMeasurementTime is not None and timeout <= maxMeasurementTime:
+            # Every measurement without new data would be mistaken for a stall
+            raise ValueError(f'Timeout of {timeout} seconds is not longer than the maximum measurement time of {maxMeasurementTime} seconds')
+        self.timeout = timeout
+        self.openTimeout = openTimeout
+        self.retryInterval = retryInterval
+
+        self.worker: _SensorWorker = None
+        self.healthy = False
+        self.replaced = False   # Sensor was replaced and has not been opened yet
+        self.lastRecoveryAttempt = None
+        self.zone: Zone = None
+        self.samplingMode: SamplingModes = None
+
+        self.stalls = 0
+        self.errors = 0
+        self.recoveries = 0
+
+    def open(self) -> None:
+        self.worker = _SensorWorker()
+        self.lastRecoveryAttempt = monotonic()
+        try:
+            self.call(self.sensor.open, timeout=self.openTimeout)
+            self.healthy = True
+        except Exception as ex:
+            # Keep trying in the background of the measurements, the sensor might come back
+            logging.error(f'Unable to open sensor. {ex}')
+            self.healthy = False
+
+    def setDirection(self, direction: Directions) -> None:
+        self.setZone(Zone(0, direction))
+
+    def setZone(self, zone: Zone) -> None:
+        self.zone = zone
+        if self.healthy:
+            self.guard(self.sensor.setZone, zone)
+
+    def setSamplingMode(self, mode: SamplingModes) -> None:
+        self.samplingMode = mode
+        if self.healthy:
+            self.guard(self.sensor.setSamplingMode, mode)
+
+    def getDistance(self) -> float:
+        if not self.healthy and not self.recover():
+            return None
+
+        return self.guard(self.sensor.getDistance)
+
+    def close(self) -> None:
+        if not self.replaced:
+            try:
+                self.call(self.sensor.close, timeout=self.openTimeout)
+            except Exception as ex:
+                logging.warning(f'Unable to close sensor. {ex}')
+        self.worker.stop()
+        self.healthy = False
+
+    def getMaxMeasurementTime(self) -> float:
+        return self.timeout
+
+    def call(self, fn: Callable, *args, timeout: float = None):
+        """Runs a sensor call on the worker thread. A stalled worker is replaced by a new one.
+        """
+        try:
+            return self.worker.call(fn, args, self.timeout if timeout is None else timeout)
+        except SensorStall:
+            if self.sensorFactory is not None:
+                # Closed in order after the blocked call, if it ever returns
+                self.worker.post(self.sensor.close)
+                self.sensor = self.sensorFactory()
+                self.replaced = True
+            self.worker.stop()
+            self.worker = _SensorWorker()
+            raise
+
+    def guard(self, fn: Callable, *args):
+        """Runs a sensor call and recovers the sensor right away, if it stalls or fails.
+
+        Returns:
+            The result of the call, or None if it failed.
+        """
+        try:
+            return self.call(fn, *args)
+        except SensorStall as ex:
+            self.stalls += 1
+            logging.warning(f'Sensor stalled. {ex}')
+        except Exception as ex:
+            self.errors += 1
+            logging.warning(f'Sensor failed. {ex}')
+
+        self.healthy = False
+        self.lastRecoveryAttempt = None
+        self.recover()
+        return None
+
+    def recover(self) -> bool:
+        """Closes and reopens the sensor and restores its configuration. Waits for the retry interval between failed attempts.
+
+        Returns:
+            bool: True, if the sensor is usable again.
+        """
+        if self.lastRecoveryAttempt is not None:
+            remaining = self.lastRecoveryAttempt + self.retryInterval - monotonic()
+            if remaining > 0:
+                sleep(remaining)
+        self.lastRecoveryAttempt = monotonic()
+
+        if not self.replaced:
+            try:
+                self.call(self.sensor.close, timeout=self.openTimeout)
+            except Exception as ex:
+                logging.debug(f'Unable to close sensor during recovery. {ex}')
+
+        try:
+            self.call(self.sensor.open, timeout=self.openTimeout)
+            self.replaced = False
+            if self.samplingMode is not None:
+                self.call(self.sensor.setSamplingMode, self.samplingMode)
+            if self.zone is not None:
+                self.call(self.sensor.setZone, self.zone)
+        except Exception as ex:
+            logging.error(f'Unable to recover sensor. {ex}')
+            return False
+
+        self.healthy = True
+        self.recoveries += 1
+        logging.info(f'Sensor recovered after {self.stalls} stalls and {self.errors} errors in total')
+        return True
+
+    def getMetrics(self) -> Dict:
+        return {
+            'healthy': self.healthy,
+            'stalls': self.stalls,
+            'errors': self.errors,
+            'recoveries': self.recoveries
+        }
@@ -0,0 +1,39 @@
+from interface.shared_ring import DEFAULT_RING_NAME, SharedRingWriter
+from monitoring.profiler import SamplingProfiler
+from sensor.people_counter import PeopleCounter
+from sensor.data_ready import GpioDataReadySource
+from sensor.vl53l1x_sensor import VL53L1XSensor
+from sensor.watchdog_sensor import WatchdogSensor
+import logging
+
+# Owns the sensor and publishes readings and count events for any number of counter scripts.
+# Start this first and set USE_SENSOR_DAEMON in the counter scripts.
+
+RING_NAME = DEFAULT_RING_NAME
+RING_CAPACITY = 4096    # Number of records kept for slow consumers
+SENSOR_LANES = 1    # Lanes side by side in the doorway, counted separately, e.g. 2 for a double-width door
+DATA_READY_PIN = None  # BCM pin wired to GPIO1 of the sensor, to read measurements as soon as they are ready. None to poll
+
+
+def create_sensor() -> VL53L1XSensor:
+    dataReady = None if DATA_READY_PIN is None else GpioDataReadySource(DATA_READY_PIN)
+    return VL53L1XSensor(dataReady, lanes=SENSOR_LANES)
+
+
+counter = PeopleCounter(WatchdogSensor(create_sensor(), sensorFactory=create_sensor))
+ring = SharedRingWriter(RING_NAME, capacity=RING_CAPACITY)
+
+logging.getLogger().setLevel(logging.INFO)
+
+
+if __name__ == "__main__":
+    counter.hookReading(ring.publishReading)
+    counter.hookChange(ring.publishChange)
+    counter.hookTrigger(ring.publishTrigger)
+    SamplingProfiler().installSignalHandler()  # Profile on SIGUSR1
+
+    logging.info(f'Publishing sensor events to shared memory {RING_NAME}')
+    try:
+        counter.run()
+    finally:
+        ring.close()
@@ -1,11 +1,19 @@
 from datetime import datetime, time, timedelta
 from typing import Dict
+from interface.light_controller import LightController
 from interface.philips_hue import PhilipsHue
-from sensor.people_counter import PeopleCounter
-from sensor.tof_sensor import Directions
+from monitoring.fault_detector import FaultDetector
+from monitoring.metrics_server import MetricsServer
+from monitoring.profiler import SamplingProfiler
+from sensor.people_counter import DirectionStateSnapshot, PeopleCounter
+from sensor.data_ready import GpioDataReadySource
 from sensor.vl53l1x_sensor import VL53L1XSensor
+from sensor.watchdog_sensor import WatchdogSensor
+from sensor.shared_ring_counter import SharedRingCounter
+from storage.event_codec import encode_event_json
+from storage.event_log import EventLog
+from storage.snapshot import restore_from_last_entry, save_snapshot
 import logging
-import json
 from timeloop import Timeloop
 
 
@@ -21,6 +29,14 @@ SCHEDULE = {}
 
 
 LOG_FILE_PATH = "log.txt"   # Path for logs
+COMPACT_LOG = False  # Log events in the fast fixed schema (v1.0) instead of the full direction state (v0.0). Lossy: only keeps count and minimum of the trigger distances
+SNAPSHOT_FILE_PATH = "snapshot.json"    # Path for periodic snapshots of the counter state
+SNAPSHOT_INTERVAL = timedelta(minutes=1)
+METRICS_PORT = 8000     # Port for live metrics at /metrics. None to disable
+METRICS_HOST = "127.0.0.1"    # Only serve metrics and profiles locally. "" to serve the whole network
+USE_SENSOR_DAEMON = False   # Read events of a running sensor_daemon.py instead of opening the sensor
+SENSOR_LANES = 1    # Lanes side by side in the doorway, counted separately, e.g. 2 for a double-width door
+DATA_READY_PIN = None  # BCM pin wired to GPIO1 of the sensor, to read measurements as soon as they are ready. None to poll
 hue_conf = {
     'bridge_ip': '',
     'transition_time': 10,  # seconds
@@ -30,30 +46,14 @@ hue_conf = {
 }   # Custom configuration for philips hue
 
 
-hue: PhilipsHue = PhilipsHue(hue_conf)  # Light interface
-counter: PeopleCounter = PeopleCounter(VL53L1XSensor())  # Sensor object
-peopleCount: int = 0    # Global count of people on the inside
-motion_triggered_lights = False   # Is light on because of any detected motion
-timeloop: Timeloop = Timeloop()  # Used for time triggered schedule
-
-logging.getLogger().setLevel(logging.INFO)
-
+def create_sensor() -> VL53L1XSensor:
+    dataReady = None if DATA_READY_PIN is None else GpioDataReadySource(DATA_READY_PIN)
+    return VL53L1XSensor(dataReady, lanes=SENSOR_LANES)
 
-def time_minus_time(time_a: time, time_b: time) -> timedelta:
-    """Implementes a basic timedelta function for time objects.
-
-    Args:
-        time_a (time): Time to subtract from.
-        time_b (time): Time to be subtracted.
 
-    Returns:
-        timedelta: Delta between the two time objects.
-    """
-    today = datetime.today()
-    dt_a = datetime.combine(today, time_a)
-    dt_b = datetime.combine(today, time_b)
-
-    return dt_a - dt_b
+hue: PhilipsHue = PhilipsHue(hue_conf)  # Light interface
+event_log: EventLog = EventLog(LOG_FILE_PATH)   # Indexed log of all events
+fault_detector: FaultDetector = FaultDetector()    # Rolling fault rates of the count
 
 
 def get_scene_for_time(time: time) -> str:
@@ -88,168 +88,93 @@ def get_scene_for_time(time: time) -> str:
     return list(SCHEDULE.values())[-1]
 
 
-def change_cb(countChange: int, directionState: Dict):
-    """Handles basic logging of event data for later analysis.
+def log_change(previousPeopleCount: int, countChange: int, directionState: DirectionStateSnapshot, motionTriggeredLights: bool):
+    """Handles basic logging of event data for later analysis. Called by the light controller, in order with the count changes.
 
     Args:
+        previousPeopleCount (int): People count before the change.
         countChange (int): The change in the number of people. Usually on of [-1, 0, 1].
-        directionState (Dict): Object describing the internal state of the sensor.
+        directionState (DirectionStateSnapshot): Immutable copy of the internal state of the sensor.
+        motionTriggeredLights (bool): Is light on because of any detected motion.
     """
-    data = {
-        'version': 'v0.0',
-        'previousPeopleCount': peopleCount,
-        'countChange': countChange,
-        'directionState': directionState,
-        'dateTime': datetime.now(),
-        'motionTriggeredLights': motion_triggered_lights
-    }
+    fault_detector.observeChange(previousPeopleCount, countChange, directionState)
+    now = datetime.now()
 
     try:
-        with open(LOG_FILE_PATH, 'a') as f:
-            f.write(json.dumps(data, default=str) + "\n")
+        if COMPACT_LOG:
+            event_log.append_line(encode_event_json(previousPeopleCount, countChange, directionState, now, motionTriggeredLights), now)
+        else:
+            data = {
+                'version': 'v0.0',
+                'previousPeopleCount': previousPeopleCount,
+                'countChange': countChange,
+                'directionState': directionState.toDict(),
+                'dateTime': now,
+                'motionTriggeredLights': motionTriggeredLights
+            }
+            event_log.append(data, now)
     except Exception as ex:
         logging.exception(f'Unable to write log file. {ex}')
 
 
-def count_change(change: int) -> None:
-    """Handles light state when people count changes
-
-    Args:
-        change (int): The change in the number of people. Usually on of [-1, 0, 1].
-    """
-    global hue
-    global peopleCount
-    global motion_triggered_lights
-
-    # Are lights on at the moment?
-    previous_lights_state = get_light_state()
-
-    # Apply correction
-    if peopleCount <= 0 and previous_lights_state and not motion_triggered_lights:
-        # Count was 0, but lights were on (not because of motion triggers) => people count was not actually 0
-        peopleCount = 1
-        logging.debug(f'People count corrected to {peopleCount}')
-    elif peopleCount > 0 and not previous_lights_state:
-        # Count was >0, but lights were off => people count was actually 0
-        peopleCount = 0
-        logging.debug(f'People count corrected to {peopleCount}')
-
-    peopleCount += change
-    if peopleCount < 0:
-        peopleCount = 0
-    logging.debug(f'People count changed by {change}')
-
-    # Handle light
-    target_light_state = peopleCount > 0
-
-    # Return, if there is no change
-    if previous_lights_state == target_light_state:
-        if previous_lights_state:
-            # Signaling that the people count is taking control over the light now
-            motion_triggered_lights = False
-        return
+controller: LightController = LightController(hue, hue_conf['light_group'], get_scene_for_time,
+                                              onChange=log_change, onCorrection=fault_detector.observeCorrection)  # Owns count and light state
+counter: PeopleCounter = SharedRingCounter() if USE_SENSOR_DAEMON else PeopleCounter(WatchdogSensor(create_sensor(), sensorFactory=create_sensor))  # Sensor object
+timeloop: Timeloop = Timeloop()  # Used for time triggered schedule
 
-    set_light_state(target_light_state)
+logging.getLogger().setLevel(logging.INFO)
 
 
-def trigger_change(triggerState: Dict):
-    """Handles motion triggered light state.
+def time_minus_time(time_a: time, time_b: time) -> timedelta:
+    """Implementes a basic timedelta function for time objects.
 
     Args:
-        triggerState (Dict): Describing in what directions the sensor is triggerd.
-    """
-    global hue
-    global motion_triggered_lights
-
-    target_light_state = None
+        time_a (time): Time to subtract from.
+        time_b (time): Time to be subtracted.
 
-    # Is someone walking close to the door?
-    motion_detected = triggerState[Directions.INSIDE] or triggerState[Directions.OUTSIDE]
-    target_light_state = motion_detected
+    Returns:
+        timedelta: Delta between the two time objects.
+    """
+    today = datetime.today()
+    dt_a = datetime.combine(today, time_a)
+    dt_b = datetime.combine(today, time_b)
 
-    # Does motion triggered light need to do anything?
-    if peopleCount > 0:
-        # State is successfully handled by the count
-        motion_triggered_lights = False
-        return
+    return dt_a - dt_b
 
-    # Only look at changing situations
-    if target_light_state == motion_triggered_lights:
-        return
 
-    set_light_state(target_light_state)
+def change_cb(countChange: int, directionState: DirectionStateSnapshot):
+    """Queues event data for logging.
 
-    # Save state
-    motion_triggered_lights = target_light_state
+    Args:
+        countChange (int): The change in the number of people. Usually on of [-1, 0, 1].
+        directionState (DirectionStateSnapshot): Immutable copy of the internal state of the sensor.
+    """
+    controller.postChange(countChange, directionState)
 
 
-def set_light_scene(target_scene: str) -> bool:
-    """Sets the lights to the given scene, but only, if lights are already on. Does not correct count if lights are in an unexpected state.
+def count_change(change: int) -> None:
+    """Queues people count changes for the light controller.
 
     Args:
-        target_scene (string): Name of the scene to activate.
+        change (int): The change in the number of people. Usually on of [-1, 0, 1].
     """
-    # Is valid scene?
-    if target_scene is None:
-        return
+    controller.postCount(change)
 
-    # Are lights on at the moment? Only based on people count for simplicity
-    if peopleCount <= 0:
-        # Lights are probably off, not doing anything
-        return
 
-    # Set lights to scene
-    hue.set_group_scene(hue_conf['light_group'], target_scene)
-    logging.debug(
-        f'Light scene set to {target_scene}')
-
-
-def set_light_state(target_light_state: bool) -> bool:
-    """Sets the lights to the given state.
+def trigger_change(triggerState: Dict):
+    """Queues motion triggers for the light controller.
 
     Args:
-        target_light_state (bool): Should lights on the inside be on or off.
-
-    Returns:
-        bool: Previous light state.
-    """
-    # Are lights on at the moment?
-    previous_lights_state = get_light_state()
-    if target_light_state == previous_lights_state:
-        return previous_lights_state
-
-    # Adjust light as necessary
-    target_scene = get_scene_for_time(datetime.now().time())
-    if target_light_state and target_scene:
-        # Set to specific scene if exists
-        hue.set_group_scene(hue_conf['light_group'], target_scene)
-        logging.debug(
-            f'Light state changed to {target_light_state} with scene {target_scene}')
-    else:
-        hue.set_group(hue_conf['light_group'], {'on': target_light_state})
-        logging.debug(f'Light state changed to {target_light_state}')
-
-    return previous_lights_state
-
-
-def get_light_state() -> bool:
-    """
-    Returns:
-        bool: Current light state.
+        triggerState (Dict): Describing in what directions the sensor is triggerd.
     """
-    return hue.get_group(hue_conf['light_group'])['state']['any_on']
+    controller.postTrigger(triggerState)
 
 
 def update_scene():
     """Called by time trigger to update light scene if lights are on.
     """
-    scene = get_scene_for_time(datetime.now().time())
-
-    if scene is None:
-        return
-
-    set_light_scene(scene)
-    logging.debug(f'Updated scene at {datetime.now().time()} to {scene}.')
+    controller.postSchedule()
+    logging.debug(f'Requested scene update at {datetime.now().time()}.')
 
 
 def register_time_triggers():
@@ -266,18 +191,64 @@ def register_time_triggers():
 
         timeloop._add_job(update_scene, interval=timedelta(1), offset=delta)
 
-    timeloop.start(block=False)
-
     logging.info("Registered time triggers.")
 
 
+def save_state():
+    """Called by time trigger to save a snapshot of the counter state.
+    """
+    try:
+        save_snapshot(SNAPSHOT_FILE_PATH, LOG_FILE_PATH, controller.peopleCount,
+                      controller.motionTriggeredLights, counter.getDirectionStateSnapshot().toDict())
+    except Exception as ex:
+        logging.exception(f'Unable to write snapshot. {ex}')
+
+
+def restore_previous_state():
+    """Restores the counter state of the previous run from the latest snapshot and log.
+    """
+    state = restore_from_last_entry(SNAPSHOT_FILE_PATH, LOG_FILE_PATH)
+    if state is None:
+        return
+
+    controller.peopleCount = state['peopleCount']
+    controller.motionTriggeredLights = state['motionTriggeredLights']
+    if state['directionState'] is not None:
+        counter.restoreDirectionState(state['directionState'])
+
+    logging.info(f'Restored people count of {controller.peopleCount}')
+
+
 if __name__ == "__main__":
+    restore_previous_state()
+    controller.start()
+
     if ENABLE_SCHEDULE_TRIGGERS:
         register_time_triggers()
+    timeloop._add_job(save_state, interval=SNAPSHOT_INTERVAL)
+    timeloop.start(block=False)
+
+    profiler = SamplingProfiler()
+    profiler.installSignalHandler()  # Profile on SIGUSR1
+
+    if METRICS_PORT is not None:
+        metrics_server = MetricsServer(METRICS_PORT, METRICS_HOST)
+        metrics_server.addMetrics('people_count', lambda: {'count': controller.peopleCount})
+        metrics_server.addMetrics('faults', fault_detector.getMetrics)
+        metrics_server.addMetrics('sampling_modes', counter.getSamplingModeDurations)
+        if not USE_SENSOR_DAEMON:
+            metrics_server.addMetrics('sensor', counter.sensor.getMetrics)
+        # Blocks until done, e.g. /profile?seconds=10, at most 300 seconds
+        metrics_server.addRoute('/profile', lambda query: profiler.profile(float(query.get('seconds', [profiler.duration])[0])))
+        metrics_server.start()
 
     # Represents callback trigger order
     counter.hookChange(change_cb)
     counter.hookCounting(count_change)
     counter.hookTrigger(trigger_change)
 
-    counter.run()
+    try:
+        counter.run()
+    finally:
+        controller.stop()
+        save_state()
@@ -0,0 +1,131 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+from sensor.people_counter import DirectionRecord, DirectionStateSnapshot
+from sensor.tof_sensor import Directions
+import math
+import struct
+
+# Fixed schema for counter events:
+# - Times as integer milliseconds since epoch
+# - Trigger distances summarised as count and minimum, in cm
+# - Directions as small integers in the binary format
+
+VERSION = "v1.0"
+BINARY_VERSION = 2
+
+# Version, date time, previous people count, count change, motion triggered lights, number of records per direction
+BINARY_HEADER = struct.Struct("<BqhbBBB")
+# Start time, end time, trigger count, minimum distance in mm, end distance in mm
+BINARY_RECORD = struct.Struct("<qqIHH")
+BINARY_LENGTH = struct.Struct("<H")
+NO_TIME = -1
+NO_DISTANCE = 0xFFFF
+
+
+def to_millis(time: datetime) -> int:
+    return None if time is None else int(time.timestamp() * 1000)
+
+
+def from_millis(millis: int) -> datetime:
+    return None if millis is None else datetime.fromtimestamp(millis / 1000)
+
+
+def finite(distance: float) -> float:
+    """Invalid readings, like NaN or infinity, are stored as missing distances.
+    """
+    return distance if distance is not None and math.isfinite(distance) else None
+
+
+def summarise(record: DirectionRecord) -> Tuple[int, int, int, float, float]:
+    if record.trigger_count is not None:
+        # Already summarised, e.g. after the shared ring
+        return (to_millis(record.start_time), to_millis(record.end_time), record.trigger_count,
+                finite(record.min_distance), finite(record.end_distance))
+
+    distances = record.trigger_distances
+    minimum = min(distances) if len(distances) > 0 else None
+    if minimum is not None and not math.isfinite(minimum):
+        # Only filter in the rare case of invalid readings
+        minimum = min((d for d in distances if math.isfinite(d)), default=None)
+    return (to_millis(record.start_time), to_millis(record.end_time), len(distances),
+            minimum, finite(record.end_distance))
+
+
+def json_value(value) -> str:
+    # repr is valid JSON for finite numbers, but not for NaN or infinity
+    return "null" if finite(value) is None else repr(value)
+
+
+def encode_event_json(previous_people_count: int, count_change: int, direction_state: DirectionStateSnapshot,
+                      date_time: datetime, motion_triggered_lights: bool) -> str:
+    """Encodes a counter event as a single JSON line, without going through json.dumps.
+    Readable by statistics.py.
+    """
+    directions = []
+    for direction in Directions:
+        records = ",".join(
+            '{"start_time":%s,"end_time":%s,"trigger_count":%d,"min_distance":%s,"end_distance":%s}'
+            % (start, json_value(end), count, json_value(minimum), json_value(end_distance))
+            for start, end, count, minimum, end_distance in map(summarise, direction_state[direction]))
+        directions.append('"%s":[%s]' % (direction.value, records))
+
+    return '{"version":"%s","previousPeopleCount":%d,"countChange":%d,"dateTime":%d,"motionTriggeredLights":%s,"directionState":{%s}}' % (
+        VERSION, previous_people_count, count_change, to_millis(date_time),
+        "true" if motion_triggered_lights else "false", ",".join(directions))
+
+
+def encode_event_binary(previous_people_count: int, count_change: int, direction_state: DirectionStateSnapshot,
+                        date_time: datetime, motion_triggered_lights: bool) -> bytes:
+    """Encodes a counter event into a length prefixed binary record.
+    """
+    records = [direction_state[direction] for direction in Directions]
+    parts = [BINARY_HEADER.pack(BINARY_VERSION, to_millis(date_time), previous_people_count, count_change,
+                                motion_triggered_lights, len(records[0]), len(records[1]))]
+    for direction_records in records:
+        for start, end, count, minimum, end_distance in map(summarise, direction_records):
+            parts.append(BINARY_RECORD.pack(
+                start, NO_TIME if end is None else end, count,
+                NO_DISTANCE if minimum is None else round(minimum * 10),
+                NO_DISTANCE if end_distance is None else round(end_distance * 10)))
+
+    data = b"".join(parts)
+    return BINARY_LENGTH.pack(len(data)) + data
+
+
+def decode_event_binary(data: bytes, offset: int = 0) -> Tuple[Dict, int]:
+    """Decodes a binary record into the same structure as the JSON encoding.
+
+    Returns:
+        Tuple[Dict, int]: Decoded event and offset of the next record.
+    """
+    length = BINARY_LENGTH.unpack_from(data, offset)[0]
+    offset += BINARY_LENGTH.size
+    end = offset + length
+
+    version, date_time, previous_people_count, count_change, motion, *counts = BINARY_HEADER.unpack_from(data, offset)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary event version {version}")
+    offset += BINARY_HEADER.size
+
+    direction_state: Dict[str, List[Dict]] = {}
+    for direction, count in zip(Directions, counts):
+        direction_state[direction.value] = []
+        for _ in range(count):
+            start, stop, trigger_count, minimum, end_distance = BINARY_RECORD.unpack_from(data, offset)
+            offset += BINARY_RECORD.size
+            direction_state[direction.value].append({
+                "start_time": start,
+                "end_time": None if stop == NO_TIME else stop,
+                "trigger_count": trigger_count,
+                "min_distance": None if minimum == NO_DISTANCE else minimum / 10,
+                "end_distance": None if end_distance == NO_DISTANCE else end_distance / 10
+            })
+
+    return {
+        "version": VERSION,
+        "previousPeopleCount": previous_people_count,
+        "countChange": count_change,
+        "dateTime": date_time,
+        "motionTriggeredLights": bool(motion),
+        "directionState": direction_state
+    }, end
@@ -0,0 +1,173 @@
+from datetime import datetime
+from typing import Dict, Iterator
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+
+
+# Index record: timestamp of a log entry and byte offset of its line in the log.
+# Timestamps are seconds since the epoch, so they keep increasing when local time falls back at the end of DST.
+INDEX_RECORD = struct.Struct("<dQ")
+
+
+def get_index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def parse_entry_time(entry: Dict) -> datetime:
+    if isinstance(entry["dateTime"], (int, float)):
+        # Milliseconds since epoch of the compact format
+        return datetime.fromtimestamp(entry["dateTime"] / 1000).replace(microsecond=0)
+    return datetime.strptime(str(entry["dateTime"])[:19], "%Y-%m-%d %H:%M:%S")
+
+
+class EventLog ():
+    """Append-only log with one JSON entry per line.
+    Maintains a sparse index next to it, pointing to the line of every n-th entry, to allow reading time ranges without scanning the whole log.
+    """
+
+    def __init__(self, path: str, index_every: int = 100) -> None:
+        self.path = path
+        self.index_path = get_index_path(path)
+        self.index_every = index_every
+        # Index the first entry after a restart, since the number of entries since the last index record is unknown
+        self.entries_since_index = index_every
+        self.lock = threading.Lock()
+
+    def append(self, data: Dict, time: datetime) -> None:
+        """Appends an entry to the log.
+
+        Args:
+            data (Dict): Entry to be serialized.
+            time (datetime): Time of the entry, has to be increasing between calls.
+                Local times like datetime.now() have to keep their fold attribute, to be unique in the repeated hour of a DST change.
+        """
+        self.append_line(json.dumps(data, default=str), time)
+
+    def append_line(self, line: str, time: datetime) -> None:
+        """Appends an already encoded entry, that must not contain line breaks.
+        """
+        line = (line + "\n").encode()
+
+        with self.lock:
+            with open(self.path, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(line)
+
+            if self.entries_since_index >= self.index_every:
+                with open(self.index_path, 'ab') as f:
+                    f.write(INDEX_RECORD.pack(time.timestamp(), offset))
+                self.entries_since_index = 0
+            self.entries_since_index += 1
+
+
+def get_entry_timestamp(entry: Dict, previous: float = None) -> float:
+    """Returns the seconds since the epoch of a log entry.
+
+    Args:
+        entry (Dict): Log entry.
+        previous (float, optional): Timestamp of an earlier entry. Local times of the full format are ambiguous in the hour
+            repeated at the end of DST, and are taken as the second occurrence, if the first one would be before this. Defaults to None.
+    """
+    if isinstance(entry["dateTime"], (int, float)):
+        # Milliseconds since epoch of the compact format are unambiguous
+        return entry["dateTime"] / 1000
+
+    time = parse_entry_time(entry)
+    timestamp = time.timestamp()
+    if previous is not None and timestamp < previous:
+        timestamp = max(timestamp, time.replace(fold=1).timestamp())
+    return timestamp
+
+
+def build_index(path: str, index_every: int = 100) -> None:
+    """Creates the index for an existing log, that was written without one.
+    """
+    entries = 0
+    offset = 0
+    previous = None
+    with open(path, 'rb') as log, open(get_index_path(path), 'wb') as index:
+        for line in log:
+            if entries % index_every == 0:
+                try:
+                    previous = get_entry_timestamp(json.loads(line.strip(b"\x00")), previous)
+                    index.write(INDEX_RECORD.pack(previous, offset))
+                except ValueError:
+                    # Try again with the next line
+                    entries -= 1
+            entries += 1
+            offset += len(line)
+
+
+def find_offset(path: str, start: datetime) -> int:
+    """Finds the byte offset in the log from where on all entries from the start time can be read.
+    """
+    index_path = get_index_path(path)
+    if not os.path.isfile(index_path) or os.path.getsize(index_path) < INDEX_RECORD.size:
+        return 0
+
+    with open(index_path, 'rb') as f:
+        index = f.read()
+    count = len(index) // INDEX_RECORD.size
+    timestamps = [INDEX_RECORD.unpack_from(index, i * INDEX_RECORD.size)[0] for i in range(count)]
+    if any(a > b for a, b in zip(timestamps, timestamps[1:])):
+        # E.g. the clock was set back or an index of naive local times. Bisecting could skip entries, so scan the whole log
+        return 0
+
+    # Last index record before the start. An ambiguous local start time is taken as its first occurrence, which reads a bit more
+    position = bisect.bisect_left(timestamps, start.timestamp()) - 1
+    if position < 0:
+        return 0
+    return INDEX_RECORD.unpack_from(index, position * INDEX_RECORD.size)[1]
+
+
+def read_range(path: str, start: datetime, end: datetime = None, use_mmap: bool = False) -> Iterator[Dict]:
+    """Reads all log entries in a time range, seeking directly to the start using the index if it exists.
+
+    Args:
+        path (str): Log file.
+        start (datetime): Entries before are skipped.
+        end (datetime, optional): Reading stops after this time. Defaults to None, reading until the end of the log.
+        use_mmap (bool, optional): Map the log into memory instead of reading it. Defaults to False.
+
+    Yields:
+        Dict: Parsed log entries in the range.
+    """
+    offset = find_offset(path, start)
+
+    with open(path, 'rb') as f:
+        if use_mmap:
+            if os.path.getsize(path) <= 0:
+                return
+            lines = iterate_mapped_lines(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), offset)
+        else:
+            f.seek(offset)
+            lines = iter(f)
+
+        for line in lines:
+            line = line.strip(b"\x00").strip()
+            if len(line) <= 0:
+                continue
+
+            entry = json.loads(line)
+            time = parse_entry_time(entry)
+            if time < start:
+                continue
+            if end is not None and time > end:
+                break
+            yield entry
+
+
+def iterate_mapped_lines(data: mmap.mmap, offset: int) -> Iterator[bytes]:
+    try:
+        while offset < len(data):
+            end = data.find(b"\n", offset)
+            if end < 0:
+                end = len(data)
+            yield data[offset:end]
+            offset = end + 1
+    finally:
+        data.close()
@@ -0,0 +1,161 @@
+from datetime import datetime
+from typing import Dict, List
+from sensor.people_counter import START_TIME, END_TIME, TRIGGER_DISTANCES
+from sensor.tof_sensor import Directions
+import json
+import logging
+import os
+
+
+TAIL_BLOCK_SIZE = 4096  # Bytes read at once while seeking backwards through the log
+
+
+def save_snapshot(path: str, log_path: str, people_count: int, motion_triggered_lights: bool, direction_state: Dict) -> None:
+    """Writes a compact snapshot of the counter state, together with the current size of the log.
+
+    Args:
+        path (str): Snapshot file, replaced atomically.
+        log_path (str): Event log, of which only the part after the snapshot has to be replayed on restore.
+        people_count (int): Current people count.
+        motion_triggered_lights (bool): Are lights on because of motion.
+        direction_state (Dict): In-flight direction state of the counter.
+    """
+    log_offset = os.path.getsize(log_path) if os.path.isfile(log_path) else 0
+    data = {
+        'version': 'v0.0',
+        'dateTime': datetime.now(),
+        'logOffset': log_offset,
+        'peopleCount': people_count,
+        'motionTriggeredLights': motion_triggered_lights,
+        'directionState': direction_state
+    }
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps(data, default=str))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> Dict:
+    """
+    Returns:
+        Dict: Latest snapshot, None if there is no readable one.
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as ex:
+        logging.exception(f'Unable to read snapshot. {ex}')
+        return None
+
+
+def read_last_log_entry(log_path: str, start: int = 0) -> Dict:
+    """Reads only the last complete entry, by seeking backwards from the end of the log.
+    An incomplete last line, e.g. of a process that died while writing, is skipped.
+
+    Args:
+        log_path (str): Event log.
+        start (int, optional): Byte offset of the first line to consider. Defaults to 0.
+
+    Returns:
+        Dict: Last entry after the start offset, None if there is none.
+    """
+    with open(log_path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        checked = 0     # Lines at the end, that are known to be incomplete
+        while position > start:
+            position = max(start, position - TAIL_BLOCK_SIZE)
+            f.seek(position)
+            lines = f.read(end - position).split(b"\n")
+            # First line might be cut off by the block boundary, unless it is the start
+            complete = lines if position == start else lines[1:]
+            for line in reversed(complete[:len(complete) - checked]):
+                entries = parse_log_lines(line)
+                if len(entries) > 0:
+                    return entries[-1]
+            checked = len(complete)
+    return None
+
+
+def parse_log_lines(data: bytes) -> List[Dict]:
+    entries = []
+    for line in data.split(b"\n"):
+        line = line.strip(b"\x00").strip()
+        if len(line) <= 0:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # Incomplete line, e.g. the process died while writing
+            continue
+    return entries
+
+
+def parse_direction_state(direction_state: Dict) -> Dict:
+    """Turns a serialized direction state back into the format of the counter.
+    """
+    if direction_state is None:
+        return None
+
+    parsed = {}
+    for direction in Directions:
+        parsed[direction] = []
+        for record in direction_state.get(direction.value, []):
+            record = dict(record)
+            for key in [START_TIME, END_TIME]:
+                if isinstance(record[key], (int, float)):
+                    # Milliseconds since epoch of the compact log format
+                    record[key] = datetime.fromtimestamp(record[key] / 1000)
+                elif record[key] is not None:
+                    record[key] = datetime.fromisoformat(record[key])
+            # Compact log format only keeps a summary of the distances
+            record.setdefault(TRIGGER_DISTANCES, [])
+            parsed[direction].append(record)
+    return parsed
+
+
+def is_in_flight(direction_state: Dict) -> bool:
+    """Is someone still in the doorframe, according to the direction state.
+    """
+    return any(len(records) > 0 and records[-1][END_TIME] is None for records in direction_state.values())
+
+
+def restore_from_last_entry(path: str, log_path: str) -> Dict:
+    """Restores the counter state from the last log entry written after the latest snapshot, or from the snapshot itself.
+
+    Earlier entries are not replayed. Every entry holds the people count before its change,
+    which already includes any correction based on the light state, so the last one is enough.
+
+    Returns:
+        Dict: With peopleCount, motionTriggeredLights and directionState. None if there is nothing to restore from.
+    """
+    snapshot = load_snapshot(path)
+
+    last_entry = None
+    if os.path.isfile(log_path):
+        if snapshot is not None and snapshot['logOffset'] > os.path.getsize(log_path):
+            # Log was rotated since
+            snapshot = None
+        last_entry = read_last_log_entry(log_path, snapshot['logOffset'] if snapshot is not None else 0)
+
+    if last_entry is None:
+        if snapshot is None:
+            return None
+        return {
+            'peopleCount': snapshot['peopleCount'],
+            'motionTriggeredLights': snapshot['motionTriggeredLights'],
+            'directionState': parse_direction_state(snapshot['directionState'])
+        }
+
+    direction_state = parse_direction_state(last_entry['directionState'])
+    if not is_in_flight(direction_state):
+        direction_state = None
+
+    return {
+        'peopleCount': max(0, last_entry['previousPeopleCount'] + last_entry['countChange']),
+        'motionTriggeredLights': last_entry['motionTriggeredLights'],
+        'directionState': direction_state
+    }
@@ -0,0 +1,52 @@
+from sensor.data_ready import EventDataReadySource
+from sensor.faulty_sensor import FaultySensor
+from sensor.people_counter import PeopleCounter
+from sensor.trace_sensor import TraceSensor, generateTrace
+from sensor.watchdog_sensor import WatchdogSensor
+import logging
+import threading
+import time
+
+
+CROSSINGS = 10  # Number of crossings per synthetic trace
+SEED = 42       # Same trace and faults for every run
+FAULT_RATES = [0.002, 0.01]     # Chance of a measurement to stall and to fail each
+DATA_READY = True   # Block on a data-ready signal of the trace sensor, like with DATA_READY_PIN, instead of sleeping
+
+
+def run_trace(faultRate: float) -> None:
+    """Runs the counter on a synthetic trace with injected sensor faults and prints detections and recoveries.
+
+    Args:
+        faultRate (float): Chance of a measurement to stall and, separately, to raise an error.
+    """
+    trace = generateTrace(CROSSINGS, minGap=1, maxGap=5, seed=SEED)
+    sensor = TraceSensor(trace, dataReady=EventDataReadySource() if DATA_READY else None)
+    faulty = FaultySensor(sensor, stallProbability=faultRate, errorProbability=faultRate, stallDuration=5, failedOpens=1, seed=SEED)
+    watchdog = WatchdogSensor(faulty, retryInterval=0.2)
+    counter = PeopleCounter(watchdog)
+
+    changes = []
+    counter.hookCounting(changes.append)
+
+    th = threading.Thread(target=counter.run)
+    th.start()
+    time.sleep(sensor.getDuration() + 1)
+    counter.stop()
+    th.join()
+
+    expected = [c.countChange for c in trace]
+    metrics = watchdog.getMetrics()
+    print("Fault rate:", faultRate)
+    print("Detected crossings:", len(changes), "of", len(expected))
+    print("Correct directions:", changes == expected)
+    print("Measurements:", sensor.measurementCount)
+    print("Injected stalls:", faulty.injectedStalls, "errors:", faulty.injectedErrors)
+    print("Detected stalls:", metrics['stalls'], "errors:", metrics['errors'], "recoveries:", metrics['recoveries'])
+    print("-"*20)
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.ERROR)
+    for faultRate in FAULT_RATES:
+        run_trace(faultRate)
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import List, Tuple
+
+
+def downsample_step_series(times: List[datetime], counts: List[int], buckets: int) -> Tuple[List[datetime], List[int]]:
+    """Reduces a chronological series to at most four points per bucket (first, min, max and last, in their original order).
+    With one bucket per pixel, the rendered chart looks the same as with all points.
+
+    Args:
+        times (List[datetime]): Chronologically sorted times.
+        counts (List[int]): Value for each time.
+        buckets (int): Number of equally long time buckets, e.g. the width of the plot in pixels.
+
+    Returns:
+        Tuple[List[datetime], List[int]]: Downsampled times and counts.
+    """
+    if len(times) <= buckets * 4 or buckets <= 0:
+        return times, counts
+
+    start = times[0].timestamp()
+    span = times[-1].timestamp() - start
+    if span <= 0:
+        return times, counts
+
+    sampled_times = []
+    sampled_counts = []
+    bucket_start = 0
+    bucket = 0
+    for i in range(len(times) + 1):
+        if i < len(times):
+            current = min(int((times[i].timestamp() - start) / span * buckets), buckets - 1)
+            if current == bucket:
+                continue
+
+        # Bucket from bucket_start to i is complete
+        indices = range(bucket_start, i)
+        keep = {bucket_start, i - 1, min(indices, key=counts.__getitem__), max(indices, key=counts.__getitem__)}
+        for index in sorted(keep):
+            sampled_times.append(times[index])
+            sampled_counts.append(counts[index])
+
+        if i < len(times):
+            bucket_start = i
+            bucket = current
+
+    return sampled_times, sampled_counts
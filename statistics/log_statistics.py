@@ -0,0 +1,188 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import json
+import os
+from typing import Dict, List, Tuple
+from xmlrpc.client import Boolean
+
+
+def parse_log_entry(entry: Dict, start: datetime, end: datetime = None) -> Dict:
+    # Only keep last record of a sequence
+    if not is_last_in_sequence(entry):
+        return False
+
+    if not is_in_range(entry, start, end):
+        return False
+
+    return entry
+
+
+def is_in_range(entry: Dict, start: datetime, end: datetime = None) -> Boolean:
+    """Parses the date time of the entry in place and checks it against the time range.
+    """
+    if isinstance(entry["dateTime"], (int, float)):
+        # Milliseconds since epoch of the compact format
+        entry["dateTime"] = datetime.fromtimestamp(entry["dateTime"] / 1000).replace(microsecond=0)
+    elif not isinstance(entry["dateTime"], datetime):
+        # Same as strptime with "%Y-%m-%d %H:%M:%S", but fast enough to run on every entry
+        entry["dateTime"] = datetime.fromisoformat(str(entry["dateTime"])[:19])
+    if entry["dateTime"] < start:
+        return False
+    if end is not None and entry["dateTime"] > end:
+        return False
+
+    return True
+
+
+def is_last_in_sequence(entry: Dict) -> Boolean:
+    indoor = entry["directionState"]["indoor"]
+    outdoor = entry["directionState"]["outdoor"]
+
+    if len(indoor) <= 0 or len(outdoor) <= 0:
+        return False
+
+    # A record is completed once it has an end time. Its end distance might be missing for an invalid reading
+    end_key = "end_time"
+    # Check version
+    if end_key not in indoor[-1]:
+        end_key = "end"
+
+    if indoor[-1][end_key] is None or outdoor[-1][end_key] is None:
+        return False
+
+    return True
+
+
+class LogStatistics ():
+    """Statistics over a consecutive part of the log. Partial statistics of neighbouring parts can be merged.
+    """
+
+    def __init__(self) -> None:
+        self.total = 0          # Number of entries in the time range, before filtering
+        self.records = 0        # Number of entries after filtering
+        self.times: List[datetime] = []
+        self.counts: List[int] = []
+        self.walk_ins = 0
+        self.walk_outs = 0
+        self.walk_unders = 0
+        self.pairs = 0          # Number of compared consecutive entries
+        self.false_0 = 0
+        self.false_1 = 0
+        self.first = None       # (previousPeopleCount, countChange) of first filtered entry
+        self.last = None        # (previousPeopleCount, countChange) of last filtered entry
+
+    def add_unfiltered(self, entry: Dict, start: datetime, end: datetime = None) -> None:
+        """Counts a raw log entry towards the total, if it is in the time range, and adds it, if it is also the last of its sequence.
+        """
+        if not is_in_range(entry, start, end):
+            return
+        self.total += 1
+
+        if is_last_in_sequence(entry):
+            self.add(entry)
+
+    def add(self, entry: Dict) -> None:
+        """Adds an already filtered entry.
+        """
+        record = (entry["previousPeopleCount"], entry["countChange"])
+        self.records += 1
+        self.times.append(entry["dateTime"])
+        self.counts.append(record[0])
+
+        if record[1] > 0:
+            self.walk_ins += 1
+        elif record[1] < 0:
+            self.walk_outs += 1
+        else:
+            self.walk_unders += 1
+
+        if self.last is not None:
+            self.compare(self.last, record)
+        else:
+            self.first = record
+        self.last = record
+
+    def compare(self, current: Tuple[int, int], following: Tuple[int, int]) -> None:
+        self.pairs += 1
+        estimated_count: int = current[0] + current[1]
+        if estimated_count == following[0]:
+            return
+
+        if current[0] == 0:
+            self.false_0 += 1
+        else:
+            self.false_1 += 1
+
+    def merge(self, other: 'LogStatistics') -> None:
+        """Appends the statistics of the directly following part of the log.
+        """
+        self.total += other.total
+        self.records += other.records
+        self.times += other.times
+        self.counts += other.counts
+        self.walk_ins += other.walk_ins
+        self.walk_outs += other.walk_outs
+        self.walk_unders += other.walk_unders
+        self.pairs += other.pairs
+        self.false_0 += other.false_0
+        self.false_1 += other.false_1
+
+        if other.first is None:
+            return
+        if self.last is not None:
+            # Pair across the border of both parts
+            self.compare(self.last, other.first)
+        else:
+            self.first = other.first
+        self.last = other.last
+
+    def get_fault_count(self) -> int:
+        return self.false_0 + self.false_1
+
+
+def split_chunks(path: str, count: int) -> List[Tuple[int, int]]:
+    """Splits a file into byte ranges, that start and end at line breaks.
+    """
+    size = os.path.getsize(path)
+    chunks = []
+    with open(path, 'rb') as f:
+        start = 0
+        for i in range(1, count + 1):
+            end = size * i // count
+            if end < size:
+                # Move end to the next line break
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            if end > start:
+                chunks.append((start, end))
+            start = max(start, end)
+    return chunks
+
+
+def parse_chunk(path: str, start: int, end: int, start_date: datetime, end_date: datetime = None) -> LogStatistics:
+    statistics = LogStatistics()
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    for line in data.split(b"\n"):
+        line = line.strip(b"\x00").strip()
+        if len(line) <= 0:
+            continue
+        statistics.add_unfiltered(json.loads(line), start_date, end_date)
+    return statistics
+
+
+def parse_parallel(path: str, workers: int, start_date: datetime, end_date: datetime = None) -> LogStatistics:
+    """Parses the log in a process pool, with multiple chunks per worker to balance the load.
+    """
+    chunks = split_chunks(path, workers * 4)
+
+    statistics = LogStatistics()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_chunk, path, start, end, start_date, end_date) for start, end in chunks]
+        # Merge in order of the chunks
+        for future in futures:
+            statistics.merge(future.result())
+    return statistics
@@ -0,0 +1,184 @@
+from datetime import datetime
+import json
+import os
+import sqlite3
+from typing import Dict, List, Tuple
+
+from log_statistics import LogStatistics, is_in_range, is_last_in_sequence
+
+# Bucket formats per resolution, sortable as text
+RESOLUTIONS = {
+    "minute": "%Y-%m-%d %H:%M:00",
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00"
+}
+# Pairs and faults are accounted to the bucket of the earlier entry. The boundary counters hold the part of them,
+# where the later entry is in a following bucket, to leave them out at the end of a queried range.
+COUNTERS = ["total", "records", "entries", "exits", "walk_unders", "pairs", "false_0", "false_1",
+            "boundary_pairs", "boundary_false_0", "boundary_false_1"]
+SCHEMA_VERSION = 2  # Rollups of older versions are dropped and ingested again
+
+
+def connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path)
+    connection.execute("""CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""")
+    if get_meta(connection, "schema_version", 1) != SCHEMA_VERSION:
+        with connection:
+            connection.execute("DROP TABLE IF EXISTS rollups")
+            connection.execute("DELETE FROM meta")
+            set_meta(connection, "schema_version", SCHEMA_VERSION)
+    connection.execute("""CREATE TABLE IF NOT EXISTS rollups (
+        resolution TEXT,
+        bucket TEXT,
+        total INTEGER,
+        records INTEGER,
+        entries INTEGER,
+        exits INTEGER,
+        walk_unders INTEGER,
+        pairs INTEGER,
+        false_0 INTEGER,
+        false_1 INTEGER,
+        boundary_pairs INTEGER,
+        boundary_false_0 INTEGER,
+        boundary_false_1 INTEGER,
+        peak_occupancy INTEGER,
+        PRIMARY KEY (resolution, bucket)
+    )""")
+    return connection
+
+
+def get_meta(connection: sqlite3.Connection, key: str, default=None):
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row is not None else default
+
+
+def set_meta(connection: sqlite3.Connection, key: str, value) -> None:
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+
+def get_buckets(time: datetime) -> List[Tuple[str, str]]:
+    return [(resolution, time.strftime(format)) for resolution, format in RESOLUTIONS.items()]
+
+
+def ingest(db_path: str, log_path: str) -> int:
+    """Adds all log entries written since the last ingest to the rollups.
+
+    Args:
+        db_path (str): SQLite database, created if necessary.
+        log_path (str): Event log.
+
+    Returns:
+        int: Number of newly ingested log entries.
+    """
+    connection = connect(db_path)
+    offset = get_meta(connection, "log_offset", 0)
+    if offset > os.path.getsize(log_path):
+        # Log was rotated, start over with the new one
+        offset = 0
+
+    with open(log_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    # Only complete lines, the last one might still be written
+    data = data[:data.rfind(b"\n") + 1]
+
+    # Last entry of the previous ingest, to compare the first new entry with
+    last = get_meta(connection, "last_entry")
+    rollups: Dict[Tuple[str, str], Dict] = {}
+    count = 0
+    for line in data.split(b"\n"):
+        line = line.strip(b"\x00").strip()
+        if len(line) <= 0:
+            continue
+        count += 1
+
+        entry = json.loads(line)
+        is_in_range(entry, datetime.min)
+        for key in get_buckets(entry["dateTime"]):
+            rollup = rollups.setdefault(key, {**{c: 0 for c in COUNTERS}, "peak_occupancy": 0})
+            rollup["total"] += 1
+        if not is_last_in_sequence(entry):
+            continue
+
+        occupancy = max(entry["previousPeopleCount"], entry["previousPeopleCount"] + entry["countChange"])
+        for key in get_buckets(entry["dateTime"]):
+            rollup = rollups.setdefault(key, {**{c: 0 for c in COUNTERS}, "peak_occupancy": 0})
+            rollup["records"] += 1
+            rollup["entries"] += entry["countChange"] > 0
+            rollup["exits"] += entry["countChange"] < 0
+            rollup["walk_unders"] += entry["countChange"] == 0
+            rollup["peak_occupancy"] = max(rollup["peak_occupancy"], occupancy)
+
+        if last is not None:
+            # Fault is accounted to the bucket of the earlier entry
+            faulty = last["previousPeopleCount"] + last["countChange"] != entry["previousPeopleCount"]
+            fault = None
+            if faulty:
+                fault = "false_0" if last["previousPeopleCount"] == 0 else "false_1"
+            for key, following in zip(get_buckets(datetime.fromisoformat(last["dateTime"])), get_buckets(entry["dateTime"])):
+                rollup = rollups.setdefault(key, {**{c: 0 for c in COUNTERS}, "peak_occupancy": 0})
+                boundary = key != following
+                rollup["pairs"] += 1
+                rollup["boundary_pairs"] += boundary
+                if fault is not None:
+                    rollup[fault] += 1
+                    rollup["boundary_" + fault] += boundary
+
+        last = {
+            "previousPeopleCount": entry["previousPeopleCount"],
+            "countChange": entry["countChange"],
+            "dateTime": entry["dateTime"].isoformat()
+        }
+
+    with connection:
+        connection.executemany(f"""INSERT INTO rollups (resolution, bucket, {", ".join(COUNTERS)}, peak_occupancy)
+            VALUES (?, ?, {", ".join("?" for _ in COUNTERS)}, ?)
+            ON CONFLICT (resolution, bucket) DO UPDATE SET
+            {", ".join(f"{c} = {c} + excluded.{c}" for c in COUNTERS)},
+            peak_occupancy = MAX(peak_occupancy, excluded.peak_occupancy)""",
+                               [(*key, *(rollup[c] for c in COUNTERS), rollup["peak_occupancy"]) for key, rollup in rollups.items()])
+        set_meta(connection, "log_offset", offset + len(data))
+        set_meta(connection, "last_entry", last)
+    connection.close()
+
+    return count
+
+
+def query(db_path: str, resolution: str, start: datetime, end: datetime = None) -> List[sqlite3.Row]:
+    """Returns rollups of a resolution in a time range, in chronological order.
+    """
+    connection = connect(db_path)
+    connection.row_factory = sqlite3.Row
+    end = end if end is not None else datetime.max
+    rows = connection.execute("""SELECT * FROM rollups WHERE resolution = ? AND bucket >= ? AND bucket <= ?
+        ORDER BY bucket""", (resolution, start.strftime(RESOLUTIONS[resolution]), end.strftime(RESOLUTIONS[resolution]))).fetchall()
+    connection.close()
+    return rows
+
+
+def load_statistics(db_path: str, resolution: str, start: datetime, end: datetime = None) -> LogStatistics:
+    """Fills statistics from the rollups instead of raw log entries. The plot series holds the peak occupancy per bucket.
+    """
+    statistics = LogStatistics()
+    rows = query(db_path, resolution, start, end)
+    for row in rows:
+        statistics.times.append(datetime.fromisoformat(row["bucket"]))
+        statistics.counts.append(row["peak_occupancy"])
+        statistics.total += row["total"]
+        statistics.records += row["records"]
+        statistics.walk_ins += row["entries"]
+        statistics.walk_outs += row["exits"]
+        statistics.walk_unders += row["walk_unders"]
+        statistics.pairs += row["pairs"]
+        statistics.false_0 += row["false_0"]
+        statistics.false_1 += row["false_1"]
+
+    if len(rows) > 0:
+        # Pair of the last bucket with the first entry after the range, like the raw log, that is clipped to the range
+        statistics.pairs -= rows[-1]["boundary_pairs"]
+        statistics.false_0 -= rows[-1]["boundary_false_0"]
+        statistics.false_1 -= rows[-1]["boundary_false_1"]
+    return statistics
@@ -1,96 +1,89 @@
 from datetime import datetime
 import json
-from typing import Dict
-from xmlrpc.client import Boolean
+import os
+import sys
 
 import matplotlib.pyplot as plt
 
-# Config
-FILE_PATH = "log.txt"
-
-
-# Read file
-content = None
-with open(FILE_PATH, "r") as file:
-    content = file.readlines()
-
-
-def parse_log_entry(entry: Dict) -> Dict:
-    # Only keep last record of a sequence
-    if not is_last_in_sequence(entry):
-        return False
-
-    entry["dateTime"] = datetime.strptime(
-        str(entry["dateTime"])[:19], "%Y-%m-%d %H:%M:%S")
-    if entry["dateTime"] < datetime(2022, 1, 1):
-        return False
-
-    return entry
-
-
-def is_last_in_sequence(entry: Dict) -> Boolean:
-    indoor = entry["directionState"]["indoor"]
-    outdoor = entry["directionState"]["outdoor"]
-    
-    if len(indoor) <= 0 or len(outdoor) <= 0:
-        return False
-    
-    end_key = "end_distance"
-    # Check version
-    if end_key not in indoor[-1]:
-        end_key = "end"
-    
-    if indoor[-1][end_key] is None or outdoor[-1][end_key] is None:
-        return False
+from downsample import downsample_step_series
+from log_statistics import LogStatistics, parse_parallel
+import rollups
 
-    return True
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from storage.event_log import get_index_path, read_range  # noqa: E402
 
-
-# Collect
-log = [json.loads(line.strip("\x00")) for line in content]
-print("Number of total entries:", len(log))
-
-# Parse & Filter
-log = [parse_log_entry(entry) for entry in log if parse_log_entry(entry)]
-print("Number of filtered entries:", len(log))
-
-# Render
-fig, ax = plt.subplots()  # Create a figure containing a single axes.
-times: list[datetime] = [entry["dateTime"] for entry in log]
-counts: list[int] = [entry["previousPeopleCount"] for entry in log]
-ax.step(times, counts, where="pre")
-plt.show()
-print("-"*20)
-
-
-# Print stats
-walk_ins = [entry for entry in log if entry["countChange"] > 0]
-walk_outs = [entry for entry in log if entry["countChange"] < 0]
-walk_unders = [entry for entry in log if entry["countChange"] == 0]
-print("Number of walk-ins:", len(walk_ins))
-print("Number of walk-outs:", len(walk_outs))
-print("Number of walk-unders:", len(walk_unders))
-print("-"*20)
-
-# Calculate faults
-for c, n in zip(list(range(len(log))), list(range(len(log)))[1:]):
-    estimated_count: int = log[c]["previousPeopleCount"] + \
-        log[c]["countChange"]
-    faulty: bool = estimated_count != log[n]["previousPeopleCount"]
-    log[c]["faulty"] = faulty
-    log[c]["faultyCount"] = log[c]["previousPeopleCount"] if faulty else None
-
-log = log[:-1]
-fault_count = sum(1 for entry in log if entry["faulty"])
-print("Number of faults:", fault_count)
-print("Percentage of faults:", fault_count / len(log) * 100, "%")
-
-print("-"*20)
-faulty_off = [entry for entry in log if entry["faulty"]
-              and entry["faultyCount"] == 0]
-faulty_on = [entry for entry in log if entry["faulty"]
-             and entry["faultyCount"] != 0]
-print("Number of false-0:", len(faulty_off))
-print("Number of false-1:", len(faulty_on))
-print("Percentage of false-0:", len(faulty_off) / fault_count * 100, "%")
-print("Percentage of false-1:", len(faulty_on) / fault_count * 100, "%")
+# Config
+FILE_PATH = "log.txt"
+START_DATE = datetime(2022, 1, 1)   # Only entries after this date are analysed
+END_DATE = None     # Only entries before this date are analysed, None for no limit
+USE_MMAP = False    # Map the log into memory for indexed range queries
+# Number of processes to parse logs without index. None to parse in this process
+PARALLEL_WORKERS = os.cpu_count()
+# Ingest new log entries into pre-aggregated rollups and analyse those instead of the raw log
+USE_ROLLUPS = False
+ROLLUP_DB_PATH = "rollups.db"
+ROLLUP_RESOLUTION = "minute"    # One of minute, hour or day
+DOWNSAMPLE = True   # Reduce the plotted series to a few points per pixel
+OUTPUT_PATH = None  # Write the chart to this image file instead of showing it, e.g. on a server without display
+
+
+def collect() -> LogStatistics:
+    if USE_ROLLUPS:
+        ingested = rollups.ingest(ROLLUP_DB_PATH, FILE_PATH)
+        print("Number of newly ingested entries:", ingested)
+        return rollups.load_statistics(ROLLUP_DB_PATH, ROLLUP_RESOLUTION, START_DATE, END_DATE)
+
+    if os.path.isfile(get_index_path(FILE_PATH)):
+        # Only read the requested time range
+        log = list(read_range(FILE_PATH, START_DATE, END_DATE, use_mmap=USE_MMAP))
+    elif PARALLEL_WORKERS is not None and PARALLEL_WORKERS > 1:
+        return parse_parallel(FILE_PATH, PARALLEL_WORKERS, START_DATE, END_DATE)
+    else:
+        with open(FILE_PATH, "r") as file:
+            log = [json.loads(line.strip("\x00")) for line in file.readlines() if line.strip("\x00").strip()]
+
+    # Parse & Filter
+    statistics = LogStatistics()
+    for entry in log:
+        statistics.add_unfiltered(entry, START_DATE, END_DATE)
+    return statistics
+
+
+if __name__ == "__main__":
+    # Collect
+    statistics = collect()
+    print("Number of total entries:", statistics.total)
+    print("Number of filtered entries:", statistics.records)
+
+    # Render
+    if OUTPUT_PATH is not None:
+        plt.switch_backend("Agg")
+    fig, ax = plt.subplots()  # Create a figure containing a single axes.
+    times, counts = statistics.times, statistics.counts
+    if DOWNSAMPLE:
+        width = int(fig.get_size_inches()[0] * fig.dpi)
+        times, counts = downsample_step_series(times, counts, width)
+    ax.step(times, counts, where="pre")
+    if OUTPUT_PATH is not None:
+        fig.savefig(OUTPUT_PATH)
+        print("Chart written to", OUTPUT_PATH)
+    else:
+        plt.show()
+    print("-"*20)
+
+    # Print stats
+    print("Number of walk-ins:", statistics.walk_ins)
+    print("Number of walk-outs:", statistics.walk_outs)
+    print("Number of walk-unders:", statistics.walk_unders)
+    print("-"*20)
+
+    # Calculate faults
+    fault_count = statistics.get_fault_count()
+    print("Number of faults:", fault_count)
+    print("Percentage of faults:", fault_count / statistics.pairs * 100, "%")
+
+    print("-"*20)
+    print("Number of false-0:", statistics.false_0)
+    print("Number of false-1:", statistics.false_1)
+    print("Percentage of false-0:", statistics.false_0 / fault_count * 100, "%")
+    print("Percentage of false-1:", statistics.false_1 / fault_count * 100, "%")
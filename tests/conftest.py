@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules import each other relative to src and statistics, like the scripts in there.
+# Appended last, so statistics/statistics.py does not shadow the standard library module
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.append(os.path.join(ROOT, "statistics"))
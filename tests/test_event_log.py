@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+from storage.event_log import INDEX_RECORD, EventLog, build_index, find_offset, get_index_path, read_range
+import json
+import os
+import pytest
+import time
+
+
+@pytest.fixture
+def fall_back_time_zone():
+    """Local time zone, in which 2023-10-29 02:00 to 03:00 happens twice.
+    """
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "Europe/Berlin"
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+def write_full_log(path: str, index: bool):
+    """Entries every 5 minutes from 01:00 to 04:00 local time, over the DST change, in the full format with naive local times.
+    """
+    log = EventLog(path, index_every=3)
+    first = datetime(2023, 10, 28, 23, tzinfo=timezone.utc).timestamp()   # 01:00 CEST
+    for i in range(48):
+        now = datetime.fromtimestamp(first + i * 300)
+        line = json.dumps({'version': 'v0.0', 'countChange': i, 'dateTime': now}, default=str)
+        if index:
+            log.append_line(line, now)
+        else:
+            with open(path, 'a') as f:
+                f.write(line + "\n")
+
+
+def read_index(path: str):
+    with open(get_index_path(path), 'rb') as f:
+        data = f.read()
+    return [INDEX_RECORD.unpack_from(data, i) for i in range(0, len(data), INDEX_RECORD.size)]
+
+
+@pytest.mark.parametrize("appended", [True, False])
+def test_index_increases_over_dst_fall_back(tmp_path, fall_back_time_zone, appended):
+    path = str(tmp_path / "log.txt")
+    write_full_log(path, index=appended)
+    if not appended:
+        build_index(path, index_every=3)
+
+    timestamps = [timestamp for timestamp, _ in read_index(path)]
+    assert timestamps == sorted(timestamps)
+    # Entries of the second 02:xx hour are found from the start of the first one
+    entries = list(read_range(path, datetime(2023, 10, 29, 2, 0)))
+    assert [entry['countChange'] for entry in entries][:12] == list(range(12, 24))
+    assert len(entries) == 48 - 12
+
+
+def test_unordered_index_scans_whole_log(tmp_path):
+    path = str(tmp_path / "log.txt")
+    log = EventLog(path, index_every=1)
+    start = datetime(2024, 1, 1, 12)
+    for i, minutes in enumerate([0, 10, 20, 5, 30]):
+        log.append_line(json.dumps({'countChange': i, 'dateTime': start + timedelta(minutes=minutes)}, default=str),
+                        start + timedelta(minutes=minutes))
+
+    assert find_offset(path, start + timedelta(minutes=25)) == 0
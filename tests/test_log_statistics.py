@@ -0,0 +1,24 @@
+from datetime import datetime
+from sensor.people_counter import DirectionStateSnapshot, START_TIME, END_TIME, TRIGGER_DISTANCES, END_DISTANCE
+from sensor.tof_sensor import Directions
+from storage.event_codec import encode_event_json
+from log_statistics import is_last_in_sequence
+import json
+
+
+def encode(end_time: datetime, end_distance: float) -> dict:
+    state = DirectionStateSnapshot({direction: [{
+        START_TIME: datetime(2024, 1, 1, 12),
+        END_TIME: end_time,
+        TRIGGER_DISTANCES: [80.0],
+        END_DISTANCE: end_distance
+    }] for direction in Directions})
+    return json.loads(encode_event_json(0, 1, state, datetime(2024, 1, 1, 12, 0, 1), False))
+
+
+def test_completed_record_with_invalid_end_distance():
+    assert is_last_in_sequence(encode(datetime(2024, 1, 1, 12, 0, 1), float("nan")))
+
+
+def test_record_in_flight():
+    assert not is_last_in_sequence(encode(None, None))
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from interface.shared_ring import HEADER, SharedRingReader, SharedRingWriter
+from sensor.people_counter import DirectionStateSnapshot, START_TIME, END_TIME, TRIGGER_DISTANCES, END_DISTANCE
+from sensor.shared_ring_counter import SharedRingCounter
+from sensor.tof_sensor import Directions
+import os
+import pytest
+import struct
+
+
+def make_state(records: int, samples: int) -> DirectionStateSnapshot:
+    start = datetime(2024, 1, 1, 12)
+    return DirectionStateSnapshot({direction: [{
+        START_TIME: start + timedelta(seconds=i),
+        END_TIME: start + timedelta(seconds=i, milliseconds=500),
+        TRIGGER_DISTANCES: [80.0 + j for j in range(samples)],
+        END_DISTANCE: 200.0
+    } for i in range(records)] for direction in Directions}, lane=1)
+
+
+@pytest.fixture
+def ring_name():
+    return f"test_ring_{os.getpid()}"
+
+
+def publish_and_read(ring_name: str, state: DirectionStateSnapshot, slotSize: int = 512) -> DirectionStateSnapshot:
+    writer = SharedRingWriter(ring_name, capacity=4, slotSize=slotSize)
+    try:
+        reader = SharedRingReader(ring_name)
+        writer.publishChange(1, state)
+        records = reader.read()
+        reader.close()
+    finally:
+        writer.close()
+
+    assert len(records) == 1
+    return SharedRingCounter(ring_name).decodeDirectionState(records[0].payload, records[0].lane)
+
+
+def test_small_state_is_published_as_json(ring_name):
+    state = make_state(1, 3)
+    assert publish_and_read(ring_name, state).toDict() == state.toDict()
+
+
+def test_long_crossing_keeps_trigger_summary(ring_name):
+    state = make_state(2, 5000)
+    decoded = publish_and_read(ring_name, state)
+
+    assert decoded.lane == 1
+    for direction in Directions:
+        for original, record in zip(state[direction], decoded[direction]):
+            assert record.trigger_distances == ()
+            assert record.trigger_count == 5000
+            assert record.min_distance == 80.0
+            assert record.end_time == original.end_time
+
+
+def test_oversized_state_keeps_first_and_last_record(ring_name):
+    state = make_state(40, 1)
+    decoded = publish_and_read(ring_name, state, slotSize=256)
+
+    for direction in Directions:
+        assert [record.start_time for record in decoded[direction]] == [state[direction][0].start_time, state[direction][-1].start_time]
+
+
+def test_empty_payload_gives_empty_state():
+    decoded = SharedRingCounter().decodeDirectionState(b"", 1)
+    assert decoded.lane == 1
+    assert all(len(decoded[direction]) == 0 for direction in Directions)
+
+
+def test_refuses_ring_of_running_writer(ring_name):
+    writer = SharedRingWriter(ring_name, capacity=4)
+    try:
+        with pytest.raises(FileExistsError):
+            SharedRingWriter(ring_name, capacity=4)
+    finally:
+        writer.close()
+
+
+def test_reclaims_ring_of_stopped_writer(ring_name):
+    stale = SharedRingWriter(ring_name, capacity=4)
+    # No process has this id, since it is above the default maximum
+    struct.pack_into("<I", stale.memory.buf, HEADER.size - 4, 2 ** 31 - 1)
+    stale.memory.close()
+
+    writer = SharedRingWriter(ring_name, capacity=4)
+    writer.close()
@@ -0,0 +1,50 @@
+from storage.snapshot import TAIL_BLOCK_SIZE, read_last_log_entry, restore_from_last_entry, save_snapshot
+import json
+
+
+def write_entries(path, counts, tail=b""):
+    with open(path, 'ab') as f:
+        for previous, change in counts:
+            f.write(json.dumps({
+                'version': 'v0.0',
+                'previousPeopleCount': previous,
+                'countChange': change,
+                'directionState': {},
+                'motionTriggeredLights': False
+            }).encode() + b"\n")
+        f.write(tail)
+
+
+def test_last_entry_skips_incomplete_line(tmp_path):
+    log = str(tmp_path / "log.txt")
+    # Padding spreads the entries over several blocks
+    write_entries(log, [(i, 1) for i in range(TAIL_BLOCK_SIZE // 50)], tail=b'{"version": "v0.0", "previousPe' + b"x" * TAIL_BLOCK_SIZE)
+
+    assert read_last_log_entry(log)['previousPeopleCount'] == TAIL_BLOCK_SIZE // 50 - 1
+
+
+def test_restores_last_entry_after_snapshot(tmp_path):
+    log, snapshot = str(tmp_path / "log.txt"), str(tmp_path / "snapshot.json")
+    write_entries(log, [(0, 1), (1, 1)])
+    save_snapshot(snapshot, log, 2, True, {})
+    # Count was corrected from 2 to 0 based on the light state before the next change
+    write_entries(log, [(0, 1)])
+
+    state = restore_from_last_entry(snapshot, log)
+    assert state['peopleCount'] == 1
+    assert state['motionTriggeredLights'] is False
+
+
+def test_restores_snapshot_without_newer_entry(tmp_path):
+    log, snapshot = str(tmp_path / "log.txt"), str(tmp_path / "snapshot.json")
+    write_entries(log, [(0, 1)])
+    save_snapshot(snapshot, log, 3, True, {})
+    write_entries(log, [], tail=b'{"version": "v0.0", "previ')
+
+    state = restore_from_last_entry(snapshot, log)
+    assert state['peopleCount'] == 3
+    assert state['motionTriggeredLights'] is True
+
+
+def test_nothing_to_restore(tmp_path):
+    assert restore_from_last_entry(str(tmp_path / "snapshot.json"), str(tmp_path / "log.txt")) is None
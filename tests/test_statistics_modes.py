@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from sensor.people_counter import DirectionStateSnapshot, START_TIME, END_TIME, TRIGGER_DISTANCES, END_DISTANCE
+from sensor.tof_sensor import Directions
+from storage.event_codec import encode_event_json
+from storage.event_log import EventLog, read_range
+from log_statistics import LogStatistics, parse_chunk, parse_parallel
+import os
+import rollups
+
+START = datetime(2024, 1, 1, 12)
+ENTRIES = 300
+
+
+def write_log(path: str) -> None:
+    log = EventLog(path, index_every=10)
+    count = 0
+    for i in range(ENTRIES):
+        time = START + timedelta(seconds=20 * i)
+        # Every third entry is written while someone is still in the doorframe
+        completed = i % 3 != 0
+        change = (1 if count == 0 or i % 4 == 0 else -1) if completed else 0
+        state = DirectionStateSnapshot({direction: [{
+            START_TIME: time,
+            END_TIME: time if completed else None,
+            TRIGGER_DISTANCES: [80.0],
+            END_DISTANCE: 200.0 if completed else None
+        }] for direction in Directions})
+        # Some counts are off, to get faults
+        previous = count + 1 if i % 25 == 0 else count
+        log.append_line(encode_event_json(previous, change, state, time, False), time)
+        count = max(0, count + change)
+
+
+def collect_all(path: str, db_path: str, start: datetime, end: datetime):
+    serial = parse_chunk(path, 0, os.path.getsize(path), start, end)
+    parallel = parse_parallel(path, 2, start, end)
+    indexed = LogStatistics()
+    for entry in read_range(path, start, end):
+        indexed.add_unfiltered(entry, start, end)
+    rollups.ingest(db_path, path)
+    rolled = rollups.load_statistics(db_path, "minute", start, end)
+    return serial, parallel, indexed, rolled
+
+
+def test_modes_agree_on_a_range(tmp_path):
+    path, db_path = str(tmp_path / "log.txt"), str(tmp_path / "rollups.db")
+    write_log(path)
+    # Range ends at the end of a minute, so the rollups cover exactly the same entries
+    start, end = START + timedelta(minutes=10), START + timedelta(minutes=40, seconds=59)
+
+    results = collect_all(path, db_path, start, end)
+    for statistics in results:
+        assert statistics.total == 93
+        assert statistics.records == 62
+    for statistics in results:
+        assert (statistics.pairs, statistics.false_0, statistics.false_1) == (results[0].pairs, results[0].false_0, results[0].false_1)
+    assert results[0].pairs == 61
+    assert results[0].get_fault_count() > 0
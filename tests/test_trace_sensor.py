@@ -0,0 +1,45 @@
+from sensor.data_ready import EventDataReadySource
+from sensor.people_counter import PeopleCounter
+from sensor.trace_sensor import Crossing, TraceSensor
+from sensor.watchdog_sensor import WatchdogSensor
+import threading
+import time
+
+
+def test_data_ready_signals_each_measurement():
+    dataReady = EventDataReadySource()
+    sensor = TraceSensor([], dataReady=dataReady)
+    sensor.open()
+    try:
+        start = time.monotonic()
+        for _ in range(3):
+            assert sensor.getDistance() == sensor.floorDistance
+        assert time.monotonic() - start >= 3 * sensor.measurementTime * 0.9
+    finally:
+        sensor.close()
+
+
+def test_missing_signal_times_out():
+    dataReady = EventDataReadySource()
+    sensor = TraceSensor([], dataReady=dataReady)
+    sensor.open()
+    sensor.measurement.cancel()
+
+    assert sensor.getDistance() is None
+    sensor.close()
+
+
+def test_counts_through_watchdog_with_data_ready():
+    trace = [Crossing(0.3, 0.6, 1), Crossing(1.5, 0.6, -1)]
+    sensor = TraceSensor(trace, dataReady=EventDataReadySource())
+    counter = PeopleCounter(WatchdogSensor(sensor))
+    changes = []
+    counter.hookCounting(changes.append)
+
+    th = threading.Thread(target=counter.run)
+    th.start()
+    time.sleep(sensor.getDuration() + 0.5)
+    counter.stop()
+    th.join()
+
+    assert changes == [1, -1]
@@ -0,0 +1,81 @@
+from sensor.tof_sensor import Directions, ToFSensor, Zone
+from sensor.watchdog_sensor import WatchdogSensor
+import threading
+
+
+class StallingSensor (ToFSensor):
+    """Returns a fixed distance, or blocks in getDistance until released while stalling is set.
+    """
+
+    def __init__(self, distance: float) -> None:
+        super().__init__()
+        self.distance = distance
+        self.stalling = False
+        self.release = threading.Event()
+        self.opened = 0
+        self.closed = threading.Event()
+        self.zone: Zone = None
+
+    def open(self) -> None:
+        self.opened += 1
+        self.closed.clear()
+
+    def setDirection(self, direction: Directions) -> None:
+        self.setZone(Zone(0, direction))
+
+    def setZone(self, zone: Zone) -> None:
+        self.zone = zone
+
+    def getDistance(self) -> float:
+        if self.stalling:
+            self.release.wait()
+        return self.distance
+
+    def getMaxMeasurementTime(self) -> float:
+        return 0.01
+
+    def close(self) -> None:
+        self.closed.set()
+
+
+def test_stalled_sensor_is_replaced_and_closed_once_it_returns():
+    stalled = StallingSensor(100)
+    replacement = StallingSensor(50)
+    watchdog = WatchdogSensor(stalled, timeout=0.1, retryInterval=0, sensorFactory=lambda: replacement)
+    watchdog.open()
+    watchdog.setZone(Zone(0, Directions.OUTSIDE))
+    assert watchdog.getDistance() == 100
+
+    stalled.stalling = True
+    assert watchdog.getDistance() is None
+    assert watchdog.getMetrics() == {'healthy': True, 'stalls': 1, 'errors': 0, 'recoveries': 1}
+
+    # Measurements resume on the replacement with the same zone, next to the blocked call
+    assert watchdog.getDistance() == 50
+    assert replacement.opened == 1
+    assert replacement.zone == Zone(0, Directions.OUTSIDE)
+    assert not stalled.closed.is_set()
+
+    stalled.release.set()
+    assert stalled.closed.wait(1)
+
+    watchdog.close()
+    assert replacement.closed.is_set()
+
+
+def test_stalled_sensor_without_factory_returns_none():
+    sensor = StallingSensor(100)
+    watchdog = WatchdogSensor(sensor, timeout=0.1, retryInterval=0)
+    watchdog.open()
+
+    sensor.stalling = True
+    assert watchdog.getDistance() is None
+    assert watchdog.getMetrics()['stalls'] == 1
+
+    # The same sensor was reopened next to the blocked call
+    sensor.stalling = False
+    assert watchdog.getDistance() == 100
+    assert sensor.opened == 2
+
+    sensor.release.set()
+    watchdog.close()